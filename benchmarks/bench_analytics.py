@@ -0,0 +1,62 @@
+"""
+Benchmark the sparse analytics module against the NetworkX baseline on synthetic witness graphs of increasing size.
+
+Usage: python benchmarks/bench_analytics.py [n_nodes ...]
+"""
+import os
+import sys
+import time
+import argparse
+import networkx as nx
+from networkx.algorithms.community import asyn_lpa_communities
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_witness_graph
+from helium_arango_analysis.adapters import create_networkx_graph
+from helium_arango_analysis.sparse import make_sparse_graph
+from helium_arango_analysis import analytics
+
+PIVOTS = 64
+# exact networkx betweenness is O(VE), so only run it below this many nodes
+MAX_NODES_EXACT_NX = 2000
+
+
+def _time(f):
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def run(sizes):
+    results = []
+    for n_nodes in sizes:
+        nodes, edges = make_witness_graph(n_nodes, 8 * n_nodes)
+        g = create_networkx_graph(nodes, edges, node_attrs=[], edge_attrs=[])
+        sg = make_sparse_graph(nodes, edges)
+        cases = {
+            'pagerank': (lambda: nx.pagerank(g), lambda: analytics.pagerank(sg)),
+            f'betweenness_k{PIVOTS}': (lambda: nx.betweenness_centrality(g, k=PIVOTS, seed=0),
+                                       lambda: analytics.approximate_betweenness(sg, k=PIVOTS, seed=0)),
+            'weak_components': (lambda: list(nx.weakly_connected_components(g)), lambda: analytics.connected_components(sg)),
+            'label_propagation': (lambda: list(asyn_lpa_communities(g.to_undirected(as_view=True), seed=0)),
+                                  lambda: analytics.label_propagation_communities(sg, seed=0)),
+        }
+        if n_nodes <= MAX_NODES_EXACT_NX:
+            cases['betweenness_exact'] = (lambda: nx.betweenness_centrality(g), lambda: analytics.approximate_betweenness(sg, k=None))
+        for name, (baseline, sparse) in cases.items():
+            r = {'n_nodes': n_nodes, 'n_edges': len(edges), 'case': name, 'networkx_s': _time(baseline), 'sparse_s': _time(sparse)}
+            results.append(r)
+            print(f"{r['n_nodes']:>9} {r['n_edges']:>10} {r['case']:<20} networkx {r['networkx_s']:>8.3f}s  "
+                  f"sparse {r['sparse_s']:>8.3f}s  ({r['networkx_s'] / r['sparse_s']:.1f}x)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sizes', metavar='n_nodes', type=int, nargs='*', default=[1_000, 10_000, 100_000], help='the node counts to benchmark at')
+    args = parser.parse_args()
+    run(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
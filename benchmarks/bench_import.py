@@ -0,0 +1,88 @@
+"""
+Measure the import time and memory cost of each helium_arango_analysis module, each in a fresh interpreter, and list
+the heavy dependencies it pulls in. With --check, exit with status 1 if importing the client takes longer than
+--max-seconds or loads any heavy dependency.
+
+Usage: python benchmarks/bench_import.py [--check] [--max-seconds 0.5] [--repeat 5] [module ...]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['helium_arango_analysis', 'helium_arango_analysis.client', 'helium_arango_analysis.async_client',
+           'helium_arango_analysis.sparse', 'helium_arango_analysis.adapters', 'helium_arango_analysis.plotting',
+           'helium_arango_analysis.spektral_utils']
+HEAVY = ['numpy', 'scipy', 'networkx', 'pandas', 'h3', 'pyarrow', 'plotly', 'pyvis', 'spektral', 'tensorflow', 'torch',
+         'torch_geometric', 'aiohttp']
+# modules that must stay importable without any heavy dependency
+LIGHT = ['helium_arango_analysis', 'helium_arango_analysis.client']
+
+# run in a fresh interpreter: time the import, then report the peak RSS and which heavy modules got loaded
+PROBE = '''
+import sys, json, time, resource
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': seconds, 'rss': rss * (1 if sys.platform == 'darwin' else 1024),
+                  'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def probe(module: str) -> dict:
+    """
+    :param module: The module to import, or '' for a bare interpreter.
+    :return: The import time in seconds, peak RSS in bytes and loaded heavy modules.
+    """
+    code = PROBE.format(module=module or 'sys', heavy=HEAVY)
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if output.returncode != 0:
+        return {'error': output.stderr.strip().splitlines()[-1]}
+    return json.loads(output.stdout)
+
+
+def measure(module: str, repeat: int, baseline_rss: int) -> dict:
+    runs = [probe(module) for _ in range(repeat)]
+    if 'error' in runs[0]:
+        return runs[0]
+    return {
+        'seconds': statistics.median(r['seconds'] for r in runs),
+        'rss_mb': (statistics.median(r['rss'] for r in runs) - baseline_rss) / 1024 ** 2,
+        'heavy': runs[0]['heavy'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--check', action='store_true', help='fail if the client is slow to import or loads heavy modules')
+    parser.add_argument('--max-seconds', type=float, default=0.5, help='the import time budget for --check')
+    args = parser.parse_args()
+
+    baseline_rss = statistics.median(probe('')['rss'] for _ in range(args.repeat))
+    print(f"{'module':<42} {'import s':>9} {'RSS MB':>8}  heavy dependencies loaded")
+    failures = []
+    for module in args.modules:
+        result = measure(module, args.repeat, baseline_rss)
+        if 'error' in result:
+            print(f"{module:<42} {'failed':>9} {'':>8}  {result['error']}")
+            continue
+        print(f"{module:<42} {result['seconds']:>9.3f} {result['rss_mb']:>8.1f}  {', '.join(result['heavy']) or '-'}")
+        if module in LIGHT:
+            if result['heavy']:
+                failures.append(f"{module} loads {', '.join(result['heavy'])}")
+            if result['seconds'] > args.max_seconds:
+                failures.append(f"{module} takes {result['seconds']:.3f}s to import (budget {args.max_seconds}s)")
+
+    if args.check and failures:
+        print('\n' + '\n'.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark create_networkx_graph: build time and peak RSS at increasing edge counts, against the previous two-pass
+implementation (add_node/add_edge loops plus nx.set_node_attributes/nx.set_edge_attributes).
+
+Usage: python benchmarks/bench_networkx_graph.py [n_edges ...]
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+import multiprocessing as mp
+import networkx as nx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_witness_graph
+from helium_arango_analysis.adapters import create_networkx_graph
+
+
+def create_networkx_graph_two_pass(nodes, edges, name=None):
+    g = nx.DiGraph(name=name)
+    node_attrs, edge_attrs = {}, {}
+    for node in nodes:
+        g.add_node(node['address'])
+        node_attrs[node['address']] = node
+    for edge in edges:
+        g.add_edge(edge['_from'], edge['_to'])
+        edge_attrs[(edge['_from'], edge['_to'])] = edge
+    nx.set_node_attributes(g, node_attrs)
+    nx.set_edge_attributes(g, edge_attrs)
+    return g
+
+
+BUILDERS = {
+    'two_pass': create_networkx_graph_two_pass,
+    'single_pass': create_networkx_graph,
+    'single_pass_drop_arango_keys': lambda nodes, edges: create_networkx_graph(nodes, edges, drop_arango_keys=True),
+    'single_pass_whitelist': lambda nodes, edges: create_networkx_graph(nodes, edges, node_attrs=['name', 'gain', 'elevation'],
+                                                                        edge_attrs=['rssi', 'snr', 'distance_m']),
+}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 ** 2 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _run(builder: str, n_edges: int, queue: mp.Queue):
+    nodes, edges = make_witness_graph(max(10, n_edges // 10), n_edges)
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    g = BUILDERS[builder](nodes, edges)
+    elapsed = time.perf_counter() - start
+    queue.put({'builder': builder, 'n_edges': g.number_of_edges(), 'seconds': elapsed,
+               'peak_rss_increase_mb': _peak_rss_mb() - rss_before})
+
+
+def run(sizes):
+    # each measurement runs in a fresh process so that peak RSS isn't polluted by previous runs
+    results = []
+    for n_edges in sizes:
+        for builder in BUILDERS:
+            queue = mp.Queue()
+            p = mp.Process(target=_run, args=(builder, n_edges, queue))
+            p.start()
+            results.append(queue.get())
+            p.join()
+            r = results[-1]
+            print(f"{r['n_edges']:>10} {r['builder']:<30} {r['seconds']:>8.3f}s {r['peak_rss_increase_mb']:>10.1f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sizes', metavar='n_edges', type=int, nargs='*', default=[10_000, 100_000, 1_000_000], help='the edge counts to benchmark at')
+    args = parser.parse_args()
+    run(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
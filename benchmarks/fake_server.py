@@ -0,0 +1,307 @@
+"""
+A local stand-in for helium-arango-http, serving the routes used by HeliumArangoHTTPClient from synthetic data (see
+benchmarks/synthetic.py), so the client and everything downstream of it can be benchmarked without a live server.
+
+Graph, witness and receipt responses follow the shapes shown in the README and examples.py. The payment summary routes
+return approximations of the real shapes, and their time filters are accepted but ignored, since the synthetic payment
+edges are aggregates without timestamps.
+
+Usage: python benchmarks/fake_server.py [--port 8000] [--hotspots 5000] [--witness-edges 50000] [--accounts 5000]
+                                        [--payment-edges 50000] [--latency 0.02] [--seed 0]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_witness_graph, make_token_flow_graph
+from helium_arango_analysis.geo import haversine
+from helium_arango_analysis.graph_utils import WITNESS_EDGE_KEYS
+
+RECEIPTS_START_TIME = 1582396185
+# responses are memoized by path and query, so the server's own JSON encoding doesn't dominate repeat requests
+MAX_MEMOIZED_RESPONSES = 4096
+
+
+class SyntheticHeliumData(object):
+    def __init__(self, n_hotspots: int = 5000, n_witness_edges: int = 50000, n_accounts: int = 5000,
+                 n_payment_edges: int = 50000, seed: int = 0):
+        """
+        Synthetic hotspots, witness edges, receipts and payments, indexed for the queries of the fake server.
+
+        :param n_hotspots: The number of hotspots.
+        :param n_witness_edges: The number of witness edges. One receipt is generated per edge.
+        :param n_accounts: The number of accounts.
+        :param n_payment_edges: The number of (payer, payee) payment edges.
+        :param seed: The random seed.
+        """
+        self.hotspots, self.witness_edges = make_witness_graph(n_hotspots, n_witness_edges, seed=seed)
+        self.accounts, self.payment_edges = make_token_flow_graph(n_accounts, n_payment_edges, seed=seed)
+        self.hotspot_by_address = {h['address']: h for h in self.hotspots}
+        self.account_by_address = {a['address']: a for a in self.accounts}
+        self.lonlat = np.array([h['geo_location']['coordinates'] for h in self.hotspots], dtype=np.float64)
+        self._cells = {}
+        self._fine_cells = None
+        self._cells_lock = threading.Lock()
+
+        self.outbound, self.inbound = defaultdict(list), defaultdict(list)
+        for edge in self.witness_edges:
+            self.outbound[edge['_from']].append(edge)
+            self.inbound[edge['_to']].append(edge)
+        self.payments_from, self.payments_to = defaultdict(list), defaultdict(list)
+        for edge in self.payment_edges:
+            self.payments_from[edge['_from']].append(edge)
+            self.payments_to[edge['_to']].append(edge)
+
+        self.receipts = []
+        for i, edge in enumerate(self.witness_edges):
+            witness = self.hotspot_by_address[edge['_to']]
+            time_ = RECEIPTS_START_TIME + i // 3
+            self.receipts.append({
+                '_key': f'{i:032x}',
+                '_id': f'witnesses/{i:032x}',
+                '_from': f"hotspots/{edge['_from']}",
+                '_to': f"hotspots/{edge['_to']}",
+                'time': time_,
+                'snr': edge['snr'],
+                'owner': witness['owner'],
+                'signal': edge['rssi'],
+                'channel': 0,
+                'gateway': edge['_to'],
+                'datarate': None,
+                'location': witness['location'],
+                'frequency': 904.6,
+                'timestamp': time_ * 10 ** 9
+            })
+        self.receipt_times = np.array([r['time'] for r in self.receipts], dtype=np.int64)
+
+    def _hotspots_by_cell(self, resolution: int) -> dict:
+        # each hotspot is located by one finest-resolution cell and bucketed by its parents, like asserted hotspot
+        # locations, so a hex holds exactly the hotspots of its children and tiled and untiled hex graphs match
+        with self._cells_lock:
+            if resolution not in self._cells:
+                import h3
+                if self._fine_cells is None:
+                    self._fine_cells = [h3.geo_to_h3(lat, lon, 15) for lon, lat in self.lonlat.tolist()]
+                by_cell = defaultdict(list)
+                for hotspot, cell in zip(self.hotspots, self._fine_cells):
+                    by_cell[h3.h3_to_parent(cell, resolution)].append(hotspot)
+                self._cells[resolution] = by_cell
+            return self._cells[resolution]
+
+    def _witness_graph(self, seeds: list) -> dict:
+        # the seeds' outbound witness edges, with the witnesses included in the nodes
+        nodes = {h['address']: h for h in seeds}
+        edges = [edge for h in seeds for edge in self.outbound.get(h['address'], ())]
+        for edge in edges:
+            nodes.setdefault(edge['_to'], self.hotspot_by_address[edge['_to']])
+        return {'nodes': list(nodes.values()), 'edges': edges}
+
+    def hex_graph(self, hex: str) -> dict:
+        import h3
+        return self._witness_graph(self._hotspots_by_cell(h3.h3_get_resolution(hex)).get(hex, []))
+
+    def coords_graph(self, lat: float, lon: float, limit: int) -> dict:
+        distances = haversine(self.lonlat[:, 0], self.lonlat[:, 1], lon, lat)
+        nearest = np.argsort(distances, kind='stable')[:limit]
+        return self._witness_graph([self.hotspots[i] for i in nearest])
+
+    def witnesses(self, address: str, direction: str) -> list:
+        edges, key = (self.outbound, '_to') if direction == 'outbound' else (self.inbound, '_from')
+        return [{**self.hotspot_by_address[edge[key]], **{k: edge[k] for k in WITNESS_EDGE_KEYS if k in edge}}
+                for edge in edges.get(address, ())]
+
+    def receipts_page(self, address: Optional[str], limit: Optional[int], min_time: Optional[int]) -> dict:
+        start = 0 if min_time is None else int(np.searchsorted(self.receipt_times, min_time, side='left'))
+        receipts = self.receipts[start:]
+        if address is not None:
+            receipts = [r for r in receipts if r['_from'].endswith(address) or r['_to'].endswith(address)]
+        return {'receipts': receipts[:limit] if limit is not None else receipts}
+
+    def payments(self, address: str, direction: str, limit: int) -> list:
+        edges, key = (self.payments_from, '_to') if direction == 'from' else (self.payments_to, '_from')
+        counterparty = 'payee' if direction == 'from' else 'payer'
+        ranked = sorted(edges.get(address, ()), key=lambda e: e['total_amount'], reverse=True)[:limit]
+        return [{counterparty: e[key], 'total_amount': e['total_amount'], 'num_payments': e['num_payments']} for e in ranked]
+
+    def top_pairs(self, sort_key: str, limit: int) -> list:
+        ranked = sorted(self.payment_edges, key=lambda e: e[sort_key], reverse=True)[:limit]
+        return [{'payer': e['_from'], 'payee': e['_to'], 'total_amount': e['total_amount'], 'num_payments': e['num_payments']}
+                for e in ranked]
+
+    def _top_accounts(self, side: str, limit: int) -> list:
+        edges = self.payments_from if side == 'payers' else self.payments_to
+        totals = [(sum(e['total_amount'] for e in es), sum(e['num_payments'] for e in es), address) for address, es in edges.items()]
+        totals.sort(reverse=True)
+        return totals[:limit]
+
+    def top_accounts(self, side: str, limit: int) -> list:
+        return [{'address': address, 'total_amount': total, 'num_payments': count}
+                for total, count, address in self._top_accounts(side, limit)]
+
+    def top_accounts_graph(self, side: str, limit: int) -> dict:
+        edges_by_account = self.payments_from if side == 'payers' else self.payments_to
+        edges = [edge for _, _, address in self._top_accounts(side, limit) for edge in edges_by_account[address]]
+        addresses = dict.fromkeys(address for edge in edges for address in (edge['_from'], edge['_to']))
+        return {'nodes': [self.account_by_address[address] for address in addresses], 'edges': edges}
+
+
+def _route(data: SyntheticHeliumData, path: str, query: dict):
+    parts = path.strip('/').split('/')
+    limit = int(query['limit']) if 'limit' in query else 100
+    if parts[0] == 'payments':
+        if len(parts) == 3 and parts[2] in ('from', 'to'):
+            return data.payments(parts[1], parts[2], limit)
+        if parts[1:] == ['totals']:
+            return data.top_pairs('total_amount', limit)
+        if parts[1:] == ['counts']:
+            return data.top_pairs('num_payments', limit)
+        if len(parts) in (2, 3) and parts[1] in ('payers', 'payees'):
+            if len(parts) == 3 and parts[2] == 'graph':
+                return data.top_accounts_graph(parts[1], limit)
+            if len(parts) == 2:
+                return data.top_accounts(parts[1], limit)
+    elif parts[0] == 'hotspots':
+        if parts[1:] == ['hex', 'graph']:
+            return data.hex_graph(query['hex'])
+        if parts[1:] == ['coords', 'graph']:
+            return data.coords_graph(float(query['lat']), float(query['lon']), limit)
+        if parts[1:] == ['receipts']:
+            return data.receipts_page(query.get('address'), int(query['limit']) if 'limit' in query else None,
+                                      int(query['min_time']) if 'min_time' in query else None)
+        if len(parts) == 3 and parts[2] in ('outbound', 'inbound'):
+            return data.witnesses(parts[1], parts[2])
+    return None
+
+
+class _Server(ThreadingHTTPServer):
+    # the default listen backlog of 5 overflows under concurrent clients, stalling connects on SYN retransmits
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FakeHeliumArangoServer(object):
+    def __init__(self, data: Optional[SyntheticHeliumData] = None, latency: float = 0., host: str = '127.0.0.1', port: int = 0):
+        """
+        A threaded HTTP server answering helium-arango-http routes from synthetic data.
+
+        :param data: (optional) The synthetic data. Defaults to SyntheticHeliumData().
+        :param latency: Seconds to sleep before answering each request, to simulate the network and database.
+        :param host: The host to bind.
+        :param port: The port to bind. 0 picks a free port, see base_url.
+        """
+        self.data = data or SyntheticHeliumData()
+        self.latency = latency
+        self.requests = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _respond(self, raw_path: str) -> Optional[bytes]:
+        with self._lock:
+            self.requests += 1
+            body = self._responses.get(raw_path)
+        if body is None:
+            url = urlparse(raw_path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            result = _route(self.data, url.path, query)
+            if result is None:
+                return None
+            body = json.dumps(result).encode()
+            with self._lock:
+                if len(self._responses) < MAX_MEMOIZED_RESPONSES:
+                    self._responses[raw_path] = body
+        return body
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately, so avoid Nagle/delayed-ACK stalls on keep-alive connections
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                try:
+                    body = server._respond(self.path)
+                    status = 404 if body is None else 200
+                except (KeyError, ValueError) as e:
+                    body, status = json.dumps({'detail': str(e)}).encode(), 422
+                if body is None:
+                    body = json.dumps({'detail': 'Not Found'}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> str:
+        """
+        Serve in a background thread.
+
+        :return: The base url, for HeliumArangoHTTPClient.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--hotspots', type=int, default=5000)
+    parser.add_argument('--witness-edges', type=int, default=50000)
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--payment-edges', type=int, default=50000)
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data = SyntheticHeliumData(args.hotspots, args.witness_edges, args.accounts, args.payment_edges, args.seed)
+    server = FakeHeliumArangoServer(data, args.latency, args.host, args.port)
+    # the first line of output is the base url, so callers can start the server on port 0 and read it back
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
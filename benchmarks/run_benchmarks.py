@@ -0,0 +1,231 @@
+"""
+Offline benchmark suite. Starts the fake helium-arango-http server (benchmarks/fake_server.py) in a subprocess, then
+times client throughput against it and the graph builders, adapters and plotting trace builders on synthetic data.
+
+Results are written as JSON, and can be compared against a previous run. Cases whose optional dependencies (e.g.
+spektral, torch-geometric, aiohttp) are not installed are recorded as skipped.
+
+Usage: python benchmarks/run_benchmarks.py [--output results.json] [--compare baseline.json] [--only REGEX]
+                                           [--hotspots 5000] [--witness-edges 50000] [--latency 0.01] [--repeat 3]
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.synthetic import make_witness_graph, make_token_flow_graph
+
+
+class Case(object):
+    def __init__(self, name: str, run, setup=None, count=None):
+        """
+        :param name: The case name, e.g. 'client/witnesses_batch'.
+        :param run: Called with the result of setup (if any), and timed.
+        :param setup: (optional) Called untimed before each run. Return values are passed to run.
+        :param count: (optional) The number of items (requests, edges, ...) processed per run, to report throughput.
+        """
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.count = count
+
+
+def _time_case(case: Case, repeat: int) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        args = case.setup() if case.setup is not None else None
+        start = time.perf_counter()
+        case.run() if case.setup is None else case.run(args)
+        seconds.append(time.perf_counter() - start)
+    result = {'min_s': min(seconds), 'median_s': statistics.median(seconds), 'repeat': repeat}
+    if case.count is not None:
+        result['count'] = case.count
+        result['per_second'] = case.count / result['min_s'] if result['min_s'] > 0 else None
+    return result
+
+
+def start_fake_server(args) -> subprocess.Popen:
+    command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'fake_server.py'), '--port', '0',
+               '--hotspots', str(args.hotspots), '--witness-edges', str(args.witness_edges),
+               '--accounts', str(args.accounts), '--payment-edges', str(args.payment_edges),
+               '--latency', str(args.latency), '--seed', str(args.seed)]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+
+def client_cases(base_url: str, args) -> list:
+    import h3
+    from helium_arango_analysis.client import HeliumArangoHTTPClient
+
+    # the same synthetic data as the server, to pick real addresses and hexes
+    hotspots, _ = make_witness_graph(args.hotspots, args.witness_edges, seed=args.seed)
+    addresses = [h['address'] for h in hotspots[:args.batch]]
+    lon, lat = hotspots[0]['geo_location']['coordinates']
+    region = h3.geo_to_h3(lat, lon, 4)
+    n_tiles = len(h3.h3_to_children(region, 6))
+
+    def witnesses_batch():
+        with HeliumArangoHTTPClient(base_url) as client:
+            _, errors = client.get_witnesses_for_hotspots(addresses)
+            assert not errors, errors
+
+    def hex_graph_tiled():
+        with HeliumArangoHTTPClient(base_url) as client:
+            client.get_witness_graph_in_hex(region, tile_resolution=6)
+
+    def receipts_stream():
+        with HeliumArangoHTTPClient(base_url) as client:
+            for _ in client.iter_witness_receipts(page_size=5000):
+                pass
+
+    def async_witnesses_batch():
+        from helium_arango_analysis.async_client import AsyncHeliumArangoHTTPClient
+
+        async def run():
+            async with AsyncHeliumArangoHTTPClient(base_url) as client:
+                async for _ in client.gather_outbound_witnesses(addresses):
+                    pass
+        asyncio.run(run())
+
+    return [
+        Case('client/witnesses_batch', witnesses_batch, count=len(addresses)),
+        Case('client/hex_graph_tiled', hex_graph_tiled, count=n_tiles),
+        Case('client/receipts_stream', receipts_stream, count=args.witness_edges),
+        Case('async_client/witnesses_batch', async_witnesses_batch, count=len(addresses)),
+    ]
+
+
+def builder_cases(args) -> list:
+    import numpy as np
+    nodes, edges = make_witness_graph(args.hotspots, args.witness_edges, seed=args.seed)
+    accounts, payments = make_token_flow_graph(args.accounts, args.payment_edges, seed=args.seed)
+
+    def networkx_graph():
+        from helium_arango_analysis.adapters import create_networkx_graph
+        create_networkx_graph(nodes, edges)
+
+    def spektral_graph():
+        from helium_arango_analysis.spektral_utils import make_spektral_graph
+        make_spektral_graph(nodes, edges, node_features=['elevation', 'gain'], edge_features=['rssi', 'snr', 'distance_m'])
+
+    def witness_nx():
+        from helium_arango_analysis.adapters import create_networkx_graph
+        return create_networkx_graph(nodes, edges, drop_arango_keys=True)
+
+    def torch_geometric(g):
+        from helium_arango_analysis.adapters import convert_nx_to_torch_geometric
+        convert_nx_to_torch_geometric(g, group_node_attrs=['elevation', 'gain'], group_edge_attrs=['rssi', 'snr'])
+
+    def sparse_graph():
+        from helium_arango_analysis.sparse import make_sparse_graph
+        make_sparse_graph(nodes, edges, node_features=['elevation', 'gain'], edge_features=['rssi', 'snr'], dtype=np.float32)
+
+    def witness_figure(g):
+        from helium_arango_analysis.plotting import witness_graph_figure
+        witness_graph_figure(g)
+
+    def witness_figure_bundled(g):
+        from helium_arango_analysis.plotting import witness_graph_figure
+        witness_graph_figure(g, bundle_resolution=6)
+
+    def token_nx():
+        from helium_arango_analysis.adapters import create_networkx_graph
+        return create_networkx_graph(accounts, payments, drop_arango_keys=True)
+
+    def sparse_layout(g):
+        from helium_arango_analysis.plotting import sparse_layout
+        sparse_layout(g, seed=0)
+
+    def flow_stats(g):
+        from helium_arango_analysis.plotting import node_flow_stats
+        g.graph.pop('flow_stats', None)
+        node_flow_stats(g)
+
+    return [
+        Case('build/create_networkx_graph', networkx_graph, count=len(edges)),
+        Case('build/make_sparse_graph', sparse_graph, count=len(edges)),
+        Case('build/make_spektral_graph', spektral_graph, count=len(edges)),
+        Case('build/convert_nx_to_torch_geometric', torch_geometric, setup=witness_nx, count=len(edges)),
+        Case('plot/witness_graph_figure', witness_figure, setup=witness_nx, count=len(edges)),
+        Case('plot/witness_graph_figure_bundled', witness_figure_bundled, setup=witness_nx, count=len(edges)),
+        Case('plot/sparse_layout', sparse_layout, setup=token_nx, count=len(accounts)),
+        Case('plot/node_flow_stats', flow_stats, setup=token_nx, count=len(payments)),
+    ]
+
+
+def compare(results: dict, baseline: dict):
+    print(f"\n{'case':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if 'min_s' not in result or not previous or 'min_s' not in previous:
+            continue
+        change = result['min_s'] / previous['min_s'] - 1 if previous['min_s'] > 0 else float('nan')
+        print(f"{name:<40} {previous['min_s']:>9.4f}s {result['min_s']:>9.4f}s {change:>+8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='a previous results file to compare against')
+    parser.add_argument('--only', help='only run cases whose name matches this regex')
+    parser.add_argument('--hotspots', type=int, default=5000)
+    parser.add_argument('--witness-edges', type=int, default=50000)
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--payment-edges', type=int, default=50000)
+    parser.add_argument('--batch', type=int, default=1000, help='the number of hotspots in batch witness lookups')
+    parser.add_argument('--latency', type=float, default=0.01, help='simulated server latency per request, in seconds')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_fake_server(args)
+    try:
+        base_url = server.stdout.readline().strip()
+        cases = client_cases(base_url, args) + builder_cases(args)
+        if args.only:
+            cases = [case for case in cases if re.search(args.only, case.name)]
+        results = {}
+        for case in cases:
+            try:
+                results[case.name] = _time_case(case, args.repeat)
+            except ImportError as e:
+                results[case.name] = {'skipped': f'{type(e).__name__}: {e}'}
+            r = results[case.name]
+            if 'skipped' in r:
+                print(f"{case.name:<40} skipped ({r['skipped']})")
+            else:
+                throughput = f"  {r['per_second']:>12,.0f}/s" if r.get('per_second') else ''
+                print(f"{case.name:<40} min {r['min_s']:>9.4f}s  median {r['median_s']:>9.4f}s{throughput}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    meta = {
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': vars(args),
+    }
+    try:
+        meta['commit'] = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        pass
+    with open(args.output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import random
+from typing import Tuple, List
+
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+MODES = ['GatewayMode.full', 'GatewayMode.light', 'GatewayMode.dataonly']
+STATUSES = ['online', 'offline']
+WORDS = ['big', 'small', 'maroon', 'teal', 'fuzzy', 'shiny', 'ant', 'owl', 'fox', 'eel', 'yak', 'crab']
+
+
+def make_address(rng: random.Random, prefix: str = '11', length: int = 51) -> str:
+    return prefix + ''.join(rng.choice(BASE58_ALPHABET) for _ in range(length - len(prefix)))
+
+
+def make_witness_graph(n_nodes: int, n_edges: int, seed: int = 0, center: Tuple[float, float] = (-79.94, 40.41),
+                       spread_deg: float = 0.5) -> Tuple[List[dict], List[dict]]:
+    """
+    Generate a synthetic witness graph shaped like the responses of get_witness_graph_in_hex.
+
+    :param n_nodes: The number of hotspots.
+    :param n_edges: The number of (unique, directed) witness edges. Capped at n_nodes * (n_nodes - 1).
+    :param seed: The random seed.
+    :param center: The (lon, lat) the hotspots are scattered around.
+    :param spread_deg: The max distance of hotspots from the center, in degrees.
+    :return: The (nodes, edges) lists.
+    """
+    rng = random.Random(seed)
+    owners = [make_address(rng, '13') for _ in range(max(1, n_nodes // 5))]
+    nodes = []
+    for i in range(n_nodes):
+        address = make_address(rng)
+        lon = center[0] + rng.uniform(-spread_deg, spread_deg)
+        lat = center[1] + rng.uniform(-spread_deg, spread_deg)
+        owner = rng.choice(owners)
+        nodes.append({
+            '_key': address,
+            '_id': f'hotspots/{address}',
+            '_rev': '_dO9xXdG--T',
+            'address': address,
+            'owner': owner,
+            'location': '8c2a847004b05ff',
+            'first_block': rng.randint(100000, 200000),
+            'last_block': rng.randint(200000, 220000),
+            'nonce': rng.randint(0, 5),
+            'name': '-'.join(rng.choice(WORDS) for _ in range(3)),
+            'reward_scale': rng.choice([None, rng.random()]),
+            'elevation': rng.randint(0, 30),
+            'gain': rng.choice([12, 23, 30, 40, 58, 80]),
+            'location_hex': '882a847005fffff',
+            'mode': rng.choice(MODES),
+            'payer': owner,
+            'status': rng.choice(STATUSES),
+            'geo_location': {'coordinates': [lon, lat], 'type': 'Point'}
+        })
+
+    n_edges = min(n_edges, n_nodes * (n_nodes - 1))
+    seen, edges = set(), []
+    while len(edges) < n_edges:
+        i, j = rng.randrange(n_nodes), rng.randrange(n_nodes)
+        if i == j or (i, j) in seen:
+            continue
+        seen.add((i, j))
+        (lon0, lat0), (lon1, lat1) = nodes[i]['geo_location']['coordinates'], nodes[j]['geo_location']['coordinates']
+        distance_m = 111000 * ((lon1 - lon0) ** 2 + (lat1 - lat0) ** 2) ** 0.5
+        edges.append({
+            '_from': nodes[i]['address'],
+            '_to': nodes[j]['address'],
+            'snr': round(rng.uniform(-20, 10), 1),
+            'rssi': int(-40 - 20 * (distance_m / 1000 + 1) ** 0.5 - rng.uniform(0, 10)),
+            'distance_m': distance_m
+        })
+    return nodes, edges
+
+
+def make_token_flow_graph(n_accounts: int, n_edges: int, seed: int = 0) -> Tuple[List[dict], List[dict]]:
+    """
+    Generate a synthetic token flow graph shaped like the responses of get_top_payees_graph.
+
+    :param n_accounts: The number of accounts.
+    :param n_edges: The number of (unique, directed) payment edges. Capped at n_accounts * (n_accounts - 1).
+    :param seed: The random seed.
+    :return: The (nodes, edges) lists.
+    """
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(n_accounts):
+        address = make_address(rng, '13')
+        nodes.append({
+            'address': address,
+            'dc_balance': 0,
+            'dc_nonce': 0,
+            'security_balance': 0,
+            'balance': rng.randint(1, 10 ** 14),
+            'nonce': rng.randint(0, 100),
+            'first_block': rng.randint(100000, 200000),
+            'last_block': rng.randint(200000, 220000),
+            'staked_balance': 0,
+            '_id': f'accounts/{address}',
+            '_key': address,
+            '_rev': '_dO9xW0W--J'
+        })
+
+    n_edges = min(n_edges, n_accounts * (n_accounts - 1))
+    seen, edges = set(), []
+    while len(edges) < n_edges:
+        # payments concentrate on a few large payees, as in the real network
+        i, j = rng.randrange(n_accounts), int(n_accounts * rng.random() ** 3)
+        if i == j or (i, j) in seen:
+            continue
+        seen.add((i, j))
+        num_payments = rng.randint(1, 100)
+        edges.append({
+            '_from': nodes[i]['address'],
+            '_to': nodes[j]['address'],
+            'total_amount': float(num_payments * rng.randint(10 ** 8, 10 ** 12)),
+            'num_payments': num_payments
+        })
+    return nodes, edges
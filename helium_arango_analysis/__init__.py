@@ -0,0 +1,21 @@
+"""
+Tools for querying, visualizing, and modeling network graphs on the Helium blockchain.
+
+Importing the package doesn't import any submodule. Submodules load on first attribute access, e.g.
+helium_arango_analysis.plotting, so that lightweight consumers of the client don't pay for NetworkX, Plotly,
+Spektral (TensorFlow) or torch-geometric.
+"""
+import importlib
+
+__all__ = ['adapters', 'analytics', 'async_client', 'cache', 'client', 'crawler', 'detection', 'geo', 'graph_utils',
+           'instrumentation', 'interning', 'plotting', 'snapshot', 'sparse', 'spektral_utils', 'temporal', 'token_flow']
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,54 +1,117 @@
-from typing import List
+import sys
+import time
+from typing import List, Optional, Iterable, Dict
+import numpy as np
 import networkx as nx
+from helium_arango_analysis.interning import AddressIndex
+from helium_arango_analysis.sparse import SparseGraph, extract_features
+from helium_arango_analysis.instrumentation import instrumented
 
 
-def create_networkx_graph(nodes: List[dict], edges: List[dict], name: str = None) -> nx.DiGraph:
+ARANGO_KEYS = ('_id', '_rev', '_key')
+ADDRESS_KEYS = ('owner', 'payer')
+
+
+def _select_attrs(record: dict, keep: Optional[Iterable[str]], drop: Iterable[str]) -> dict:
+    if keep is not None:
+        return {k: record[k] for k in keep if k in record and k not in drop}
+    if drop:
+        return {k: v for k, v in record.items() if k not in drop}
+    return record
+
+
+def _intern_addresses(attrs: dict) -> dict:
+    for k in ADDRESS_KEYS:
+        if isinstance(attrs.get(k), str):
+            attrs[k] = sys.intern(attrs[k])
+    return attrs
+
+
+@instrumented('adapters.create_networkx_graph')
+def create_networkx_graph(nodes: List[dict], edges: List[dict], name: str = None, node_attrs: Optional[List[str]] = None,
+                          edge_attrs: Optional[List[str]] = None, drop_arango_keys: bool = False,
+                          index: Optional[AddressIndex] = None) -> nx.DiGraph:
     """
     Generate a networkx graph from lists of nodes and edges.
 
     :param nodes: The list of nodes returned from a HeliumArangoHTTPClient graph request.
     :param edges: The list of edges returned from a HeliumArangoHTTPClient graph request.
     :param name: (optional) The name of graph.
+    :param node_attrs: (optional) A whitelist of node attributes to keep, e.g. ['name', 'gain']. Defaults to all attributes.
+    :param edge_attrs: (optional) A whitelist of edge attributes to keep, e.g. ['rssi', 'snr']. Defaults to all attributes.
+    :param drop_arango_keys: If True, drop the ArangoDB bookkeeping attributes (_id, _rev, _key).
+    :param index: (optional) An AddressIndex to key nodes by int id instead of address, to save memory on large graphs.
+        The redundant address, _from and _to attributes are dropped (use index.address(node) to get labels back), and
+        owner/payer addresses are interned so each distinct value is stored once.
     :return: The networkx directed graph (nx.DiGraph) with full node/edge attributes.
     """
+    drop = ARANGO_KEYS if drop_arango_keys else ()
     g = nx.DiGraph(name=name)
-    node_attrs, edge_attrs = {}, {}
-    for node in nodes:
-        g.add_node(node['address'])
-        node_attrs[node['address']] = node
-
-    for edge in edges:
-        g.add_edge(edge['_from'], edge['_to'])
-        edge_attrs[(edge['_from'], edge['_to'])] = edge
-
-    nx.set_node_attributes(g, node_attrs)
-    nx.set_edge_attributes(g, edge_attrs)
-
+    if index is None:
+        # networkx copies each attribute dict into its own, so the records themselves are never mutated
+        g.add_nodes_from((node['address'], _select_attrs(node, node_attrs, drop)) for node in nodes)
+        g.add_edges_from((edge['_from'], edge['_to'], _select_attrs(edge, edge_attrs, drop)) for edge in edges)
+    else:
+        node_drop, edge_drop = (*drop, 'address'), (*drop, '_from', '_to')
+        g.add_nodes_from((index.add(node['address']), _intern_addresses(_select_attrs(node, node_attrs, node_drop)))
+                         for node in nodes)
+        g.add_edges_from((index.add(edge['_from']), index.add(edge['_to']), _select_attrs(edge, edge_attrs, edge_drop))
+                         for edge in edges)
     return g
 
 
-def convert_nx_to_torch_geometric(g: nx.DiGraph, group_node_attrs: List[str], group_edge_attrs: List[str]):
+@instrumented('adapters.convert_nx_to_torch_geometric')
+def convert_nx_to_torch_geometric(g: nx.DiGraph, group_node_attrs: Optional[List[str]] = None, group_edge_attrs: Optional[List[str]] = None,
+                                  categories: Optional[Dict[str, list]] = None, fill_value: float = 0., return_info: bool = False):
     """
-    Convert a networkx graph to a torch-geometric Data instance.
+    Convert a networkx graph to a torch-geometric Data instance. Only the requested attributes are extracted, in a single
+    pass over nodes and edges, and the source graph is left untouched.
     :param g: The networkx.DiGraph instance.
     :param group_node_attrs: (optional) The node attributes to be concatenated and added to data.x. (default: None)
     :param group_edge_attrs: (optional) The edge attributes to be concatenated and added to data.edge_attr. (default: None)
-    :return: The torch_geometric.data.Data instance.
+    :param categories: (optional) A dict mapping string attributes, e.g. 'mode' or 'status', to their list of known values, used
+        to encode them as integer codes. Unseen values are appended to the lists in place. See sparse.extract_features.
+    :param fill_value: The value to use for missing or None attributes.
+    :param return_info: If True, also return a dict with the conversion time in seconds and the categories used.
+    :return: The torch_geometric.data.Data instance, or a (data, info) tuple if return_info is set.
     """
-    from torch_geometric.utils import from_networkx
-
-    # torch does not like non-numeric types in their Data objects.
-    for node in g.nodes():
-        for k, v in g.nodes[node].items():
-            if type(v) not in [float, int]:
-                g.nodes[node][k] = 0
-    data = from_networkx(g, group_node_attrs, group_edge_attrs)
-
+    import torch
+    from torch_geometric.data import Data
+
+    start = time.perf_counter()
+    index = {node: i for i, node in enumerate(g.nodes)}
+    edges = list(g.edges(data=True))
+    edge_index = np.empty((2, len(edges)), dtype=np.int64)
+    edge_index[0] = np.fromiter((index[u] for u, _, _ in edges), dtype=np.int64, count=len(edges))
+    edge_index[1] = np.fromiter((index[v] for _, v, _ in edges), dtype=np.int64, count=len(edges))
+
+    x, edge_attr = None, None
+    if group_node_attrs:
+        x = extract_features([data for _, data in g.nodes(data=True)], group_node_attrs, fill_value, np.float32, categories)[0]
+        x = torch.from_numpy(x)
+    if group_edge_attrs:
+        edge_attr = extract_features([data for _, _, data in edges], group_edge_attrs, fill_value, np.float32, categories)[0]
+        edge_attr = torch.from_numpy(edge_attr)
+    data = Data(x=x, edge_index=torch.from_numpy(edge_index), edge_attr=edge_attr, num_nodes=len(index))
+
+    if return_info:
+        return data, {'seconds': time.perf_counter() - start, 'categories': categories}
     return data
 
 
-
-
-
-
-
+@instrumented('adapters.convert_sparse_to_torch_geometric')
+def convert_sparse_to_torch_geometric(sg: SparseGraph):
+    """
+    Convert a SparseGraph to a torch-geometric Data instance, without going through networkx.
+    :param sg: The SparseGraph, see helium_arango_analysis.sparse.make_sparse_graph.
+    :return: The torch_geometric.data.Data instance. data.x and data.edge_attr hold the SparseGraph's node and edge features, if any.
+    """
+    import torch
+    from torch_geometric.data import Data
+
+    return Data(
+        x=None if sg.x is None else torch.from_numpy(sg.x),
+        edge_index=torch.from_numpy(sg.edge_index),
+        edge_attr=None if sg.e is None else torch.from_numpy(sg.e),
+        num_nodes=sg.n_nodes
+    )
@@ -0,0 +1,172 @@
+from typing import Dict, Optional
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+from helium_arango_analysis.sparse import SparseGraph
+
+
+def _by_address(sg: SparseGraph, values: np.ndarray) -> Dict[str, float]:
+    return dict(zip(sg.addresses, values.tolist()))
+
+
+def _binary_adjacency(sg: SparseGraph) -> sp.csr_matrix:
+    a = sg.a.tocsr(copy=True)
+    a.data = np.ones_like(a.data, dtype=np.float64)
+    return a
+
+
+def pagerank(sg: SparseGraph, alpha: float = 0.85, weighted: bool = False, tol: float = 1e-6, max_iter: int = 100) -> Dict[str, float]:
+    """
+    PageRank by power iteration on the sparse adjacency matrix. Matches networkx.pagerank, including the uniform
+    redistribution of rank from dangling nodes.
+
+    :param sg: The SparseGraph, see make_sparse_graph.
+    :param alpha: The damping factor.
+    :param weighted: If True, use the values of sg.a as edge weights. Otherwise every edge has weight 1.
+    :param tol: The convergence tolerance, as in networkx (n * tol on the L1 change between iterations).
+    :param max_iter: The max number of iterations.
+    :return: A dict of {address: pagerank}.
+    """
+    n = sg.n_nodes
+    if n == 0:
+        return {}
+    a = sg.a.tocsr().astype(np.float64) if weighted else _binary_adjacency(sg)
+    out_weight = np.asarray(a.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    # row-normalize, then iterate with the transpose so that rank flows along edges
+    p = sp.diags(np.divide(1., out_weight, out=np.zeros(n), where=~dangling)) @ a
+    pt = p.T.tocsr()
+    x = np.full(n, 1. / n)
+    for _ in range(max_iter):
+        x_last = x
+        x = alpha * (pt @ x_last + x_last[dangling].sum() / n) + (1 - alpha) / n
+        if np.abs(x - x_last).sum() < n * tol:
+            break
+    return _by_address(sg, x)
+
+
+def approximate_betweenness(sg: SparseGraph, k: Optional[int] = 256, normalized: bool = True, directed: bool = True,
+                            seed: Optional[int] = None, batch_size: int = 32) -> Dict[str, float]:
+    """
+    Betweenness centrality estimated from k sampled pivot nodes (Brandes, with unweighted shortest paths). Breadth-first
+    searches from a batch of pivots run simultaneously as sparse matrix products, one per BFS level.
+
+    Scores are extrapolated from the pivots to all n sources. With k=None, this computes exact betweenness and matches
+    networkx.betweenness_centrality.
+
+    :param sg: The SparseGraph, see make_sparse_graph.
+    :param k: The number of pivots. Larger is more accurate and proportionally slower. None uses every node.
+    :param normalized: If True, normalize by the number of node pairs, as in networkx.
+    :param directed: If False, treat edges as undirected.
+    :param seed: (optional) The random seed for sampling pivots.
+    :param batch_size: The number of pivots searched at once. Memory use grows with n * batch_size * graph depth.
+    :return: A dict of {address: betweenness}.
+    """
+    n = sg.n_nodes
+    a = _binary_adjacency(sg)
+    if not directed:
+        a = ((a + a.T) > 0).astype(np.float64).tocsr()
+    at = a.T.tocsr()
+    if k is None or k >= n:
+        pivots = np.arange(n)
+    else:
+        pivots = np.random.default_rng(seed).choice(n, size=k, replace=False)
+
+    bc = np.zeros(n)
+    for start in range(0, len(pivots), batch_size):
+        sources = pivots[start:start + batch_size]
+        columns = np.arange(len(sources))
+        sigma = np.zeros((n, len(sources)))
+        sigma[sources, columns] = 1
+        reached = sigma > 0
+        levels = [reached.copy()]
+        # forward: count shortest paths level by level
+        while True:
+            counts = at @ (sigma * levels[-1])
+            frontier = (counts > 0) & ~reached
+            if not frontier.any():
+                break
+            sigma[frontier] = counts[frontier]
+            reached |= frontier
+            levels.append(frontier)
+        # backward: accumulate dependencies from the deepest level up
+        delta = np.zeros_like(sigma)
+        for depth in range(len(levels) - 1, 0, -1):
+            coefficient = np.divide(1 + delta, sigma, out=np.zeros_like(sigma), where=levels[depth])
+            parents = levels[depth - 1]
+            delta[parents] += (sigma * (a @ coefficient))[parents]
+        delta[sources, columns] = 0
+        bc += delta.sum(axis=1)
+
+    if normalized:
+        scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 1
+    else:
+        scale = 1 if directed else 0.5
+    if len(pivots):
+        # extrapolate from the sampled pivots to all n sources
+        bc *= scale * n / len(pivots)
+    return _by_address(sg, bc)
+
+
+def connected_components(sg: SparseGraph, connection: str = 'weak') -> Dict[str, int]:
+    """
+    Label the connected components of the graph.
+
+    :param sg: The SparseGraph, see make_sparse_graph.
+    :param connection: One of {'weak', 'strong'}.
+    :return: A dict of {address: component id}. Ids are numbered from 0 in order of decreasing component size.
+    """
+    valid_connections = {'weak', 'strong'}
+    if connection not in valid_connections:
+        raise ValueError(f'connection argument must be one of {valid_connections}')
+    _, labels = csgraph.connected_components(sg.a, directed=True, connection=connection)
+    return _by_address(sg, _relabel_by_size(labels))
+
+
+def label_propagation_communities(sg: SparseGraph, weighted: bool = False, max_iter: int = 100,
+                                  seed: Optional[int] = None) -> Dict[str, int]:
+    """
+    Detect communities by semi-synchronous label propagation on the undirected graph. Each iteration, a random half of
+    the nodes adopt the label with the largest total edge weight among their neighbors (ties broken at random), until
+    labels stop changing.
+
+    :param sg: The SparseGraph, see make_sparse_graph.
+    :param weighted: If True, use the values of sg.a as edge weights. Otherwise every edge has weight 1.
+    :param max_iter: The max number of iterations.
+    :param seed: (optional) The random seed.
+    :return: A dict of {address: community id}. Ids are numbered from 0 in order of decreasing community size.
+    """
+    n = sg.n_nodes
+    rng = np.random.default_rng(seed)
+    a = sg.a.tocsr().astype(np.float64) if weighted else _binary_adjacency(sg)
+    a = (a + a.T).tocoo()
+    rows, cols, weights = a.row.astype(np.int64), a.col, a.data
+    labels = np.arange(n)
+    if not len(weights):
+        # without edges, every node is its own community
+        return _by_address(sg, _relabel_by_size(labels))
+
+    for _ in range(max_iter):
+        # total weight of each (node, neighbor label) pair. Ties go to the node's current label, so that labels settle,
+        # and are otherwise broken at random.
+        keys, inverse = np.unique(rows * n + labels[cols], return_inverse=True)
+        nodes, candidates = keys // n, keys % n
+        totals = np.bincount(inverse, weights=weights) + 1e-6 * (candidates == labels[nodes]) + rng.uniform(0, 1e-7, len(keys))
+        # keys are sorted by node, so the best label of each node is the max of its contiguous run
+        starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+        run_max = np.maximum.reduceat(totals, starts)
+        is_best = totals == np.repeat(run_max, np.diff(np.r_[starts, len(totals)]))
+        best = labels.copy()
+        best[nodes[is_best]] = candidates[is_best]
+        if np.array_equal(best, labels):
+            break
+        update = rng.random(n) < 0.5
+        labels = np.where(update, best, labels)
+    return _by_address(sg, _relabel_by_size(labels))
+
+
+def _relabel_by_size(labels: np.ndarray) -> np.ndarray:
+    unique, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(len(unique), dtype=np.int64)
+    rank[np.argsort(-counts, kind='stable')] = np.arange(len(unique))
+    return rank[inverse]
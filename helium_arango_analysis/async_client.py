@@ -0,0 +1,383 @@
+import json
+import time
+import asyncio
+import aiohttp
+from typing import Optional, List, Iterable, AsyncIterator, Tuple, Union
+from helium_arango_analysis.client import HeliumArangoHTTPClient, HeliumArangoHTTPError, request_route, RequestFailedError, RequestTimeoutError, ServerUnavailableError
+from helium_arango_analysis import instrumentation
+
+
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+
+class AsyncHeliumArangoHTTPClient(object):
+    def __init__(self, base_url: str, max_concurrency: int = 20, pool_size: int = 100, timeout: float = 60,
+                 max_retries: int = 3, backoff_factor: float = 0.5):
+        """
+        Initialize an asyncio Helium Arango HTTP Client. Exposes the same queries as HeliumArangoHTTPClient as coroutines,
+        sharing one aiohttp connection pool. Use as an async context manager, or call close() when done, e.g.
+
+            async with AsyncHeliumArangoHTTPClient('http://localhost:8000') as client:
+                async for address, witnesses in client.gather_outbound_witnesses(addresses):
+                    ...
+
+        :param base_url: The base url for the helium-arango-http server, e.g. http://localhost:8000/
+        :param max_concurrency: The max number of requests in flight at any time.
+        :param pool_size: The max number of connections kept alive to the server.
+        :param timeout: Total per-request timeout in seconds.
+        :param max_retries: The max number of retries on connection errors, timeouts and 5xx responses.
+        :param backoff_factor: Exponential backoff factor between retries, i.e. sleeps of {backoff_factor} * 2^(retry - 1) seconds.
+        """
+        if base_url[-1] == '/':
+            base_url = base_url[:-1]
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._semaphore = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        """
+        Close all pooled connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def get_request(self, url: str, params: dict = None):
+        if not instrumentation.hooks:
+            return await self._get_request(url, params)
+        info = {'phases': {}, 'bytes': 0}
+        start = time.perf_counter()
+        route = request_route(url, self.base_url)
+        try:
+            result = await self._get_request(url, params, info)
+        except Exception as e:
+            instrumentation.emit(instrumentation.Event('async_client.get_request', time.perf_counter() - start, info['phases'],
+                                                       info['bytes'], route=route, error=type(e).__name__))
+            raise
+        nodes, edges = instrumentation.graph_size(result)
+        instrumentation.emit(instrumentation.Event('async_client.get_request', time.perf_counter() - start, info['phases'],
+                                                   info['bytes'], nodes, edges, route))
+        return result
+
+    async def _get_request(self, url: str, params: Optional[dict], info: Optional[dict] = None):
+        # info, if given, collects phase timings and payload bytes for instrumentation. Network time includes waiting
+        # for a free slot under max_concurrency and any retries.
+        session = await self._get_session()
+        params = HeliumArangoHTTPClient.resolve_params(params)
+        # aiohttp rejects None query values, whereas requests silently drops them
+        if params:
+            params = {k: v for k, v in params.items() if v is not None}
+        start = time.perf_counter() if info is not None else None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            try:
+                async with self._semaphore:
+                    async with session.get(url, params=params) as response:
+                        if response.status in RETRY_STATUS_CODES and attempt < self.max_retries:
+                            continue
+                        if response.status != 200:
+                            raise RequestFailedError(url, response.status, await response.text())
+                        content = await response.read()
+                break
+            except asyncio.TimeoutError as e:
+                if attempt < self.max_retries:
+                    continue
+                raise RequestTimeoutError(f'Request to {url} timed out after {self.timeout} seconds.') from e
+            except aiohttp.ClientConnectionError as e:
+                if attempt < self.max_retries:
+                    continue
+                raise ServerUnavailableError(f'Could not connect to {url}. Please make sure that the HTTP API is online.') from e
+            except aiohttp.ClientError as e:
+                raise HeliumArangoHTTPError(f'Request to {url} failed: {e}') from e
+        if info is None:
+            return json.loads(content)
+        info['phases']['network'] = time.perf_counter() - start
+        info['bytes'] = len(content)
+        start = time.perf_counter()
+        result = json.loads(content)
+        info['phases']['decode'] = time.perf_counter() - start
+        return result
+
+    async def get_payments_from_account(self, address: str, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
+        """
+        Get payments from an account, grouped by payee and sorted by amount. Also includes payment counts for each.
+
+        :param address: The HNT wallet address of the payer.
+        :param limit: The max number of payees to return.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/{address}/from'
+        return await self.get_request(url, params=params)
+
+    async def get_payments_to_account(self, address: str, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
+        """
+        Get payments to an account, grouped by payer and sorted by amount. Also includes payment counts for each.
+
+        :param address: The HNT wallet address of the payee.
+        :param limit: The max number of payers to return.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/{address}/to'
+        return await self.get_request(url, params=params)
+
+    async def get_top_payment_totals(self, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
+        """
+        Get top payments (payer, payee) pair, sorted by total HNT paid.
+
+        :param limit: The max number of payment pairs to return.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/totals'
+        return await self.get_request(url, params=params)
+
+    async def get_top_payment_counts(self, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
+        """
+        Get top payments (payer, payee) pair, sorted by number of payments.
+
+        :param limit: The max number of payment pairs to return.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/counts'
+        return await self.get_request(url, params=params)
+
+    async def get_top_payers(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
+                             max_time: Optional[int] = None) -> List[dict]:
+        """
+        Get top payers, sorted by amount paid. Also includes payment counts for each.
+
+        :param limit: The max number of payers to return.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/payers'
+        return await self.get_request(url, params=params)
+
+    async def get_top_payees(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
+                             max_time: Optional[int] = None) -> List[dict]:
+        """
+        Get top payees, sorted by amount received. Also includes payment counts for each.
+
+        :param limit: The max number of payees to return.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/payees'
+        return await self.get_request(url, params=params)
+
+    async def get_top_payers_graph(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
+                                   max_time: Optional[int] = None) -> dict:
+        """
+        Starting with the top payers, generate the graph of token flow from these accounts.
+
+        :param limit: The max number of top payers to seed the graph.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/payers/graph'
+        return await self.get_request(url, params=params)
+
+    async def get_top_payees_graph(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
+                                   max_time: Optional[int] = None) -> dict:
+        """
+        Starting with the top payees, generate the graph of token flow to these accounts.
+
+        :param limit: The max number of top payees to seed the graph.
+        :param min_time: The minimum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'min_time': min_time,
+            'max_time': max_time
+        }
+        url = self.base_url + f'/payments/payees/graph'
+        return await self.get_request(url, params=params)
+
+    async def get_witness_graph_near_coords(self, lat: float, lon: float, limit: Optional[int] = 100) -> dict:
+        """
+        Starting with the closest hotspots to a given coordinate, generate the recent witness graph, including signal details.
+
+        :param lat: The latitude of the query coordinate.
+        :param lon: The longitude of the query coordinate.
+        :param limit: The max number of nearby hotspots to seed the graph. Note that the nodes list will also include any witnesses.
+        :return:
+        """
+        params = {
+            'limit': limit,
+            'lat': lat,
+            'lon': lon
+        }
+        url = self.base_url + f'/hotspots/coords/graph'
+        return await self.get_request(url, params=params)
+
+    async def get_witness_graph_in_hex(self, hex: str) -> dict:
+        """
+        Generate the witness graph within a hex. Be careful not to choose an excessively large hex when querying over an HTTP API.
+
+        :param hex: An h3 hex to consider.
+        :return:
+        """
+        params = {
+            'hex': hex
+        }
+        url = self.base_url + f'/hotspots/hex/graph'
+        return await self.get_request(url, params=params)
+
+    async def get_outbound_witnesses_for_hotspot(self, address: str) -> List[dict]:
+        """
+        Get the list of hotspots that have recently witnessed a challenge from this hotspot.
+
+        :param address: The hotspot address.
+        :return:
+        """
+        url = self.base_url + f'/hotspots/{address}/outbound'
+        return await self.get_request(url)
+
+    async def get_inbound_witnesses_for_hotspot(self, address: str) -> List[dict]:
+        """
+        Get the list of hotspots that this hotspot has recently witnessed.
+
+        :param address: The hotspot address.
+        :return:
+        """
+        url = self.base_url + f'/hotspots/{address}/inbound'
+        return await self.get_request(url)
+
+    async def get_sample_of_recent_witness_receipts(self, address: Optional[str] = None, limit: Optional[int] = None):
+        """
+        Get sample of recent witness receipts. If no address is specified, will return receipts from the network overall.
+
+        :param address: (optional) A hotspot address to focus on.
+        :param limit: (optional) The maximum number of receipts to return.
+        :return: The list of receipts.
+        """
+        params = {
+            'address': address,
+            'limit': limit
+        }
+        url = self.base_url + f'/hotspots/receipts'
+        return await self.get_request(url, params=params)
+
+    async def _gather(self, method, addresses: Iterable[str], return_exceptions: bool) -> AsyncIterator[Tuple[str, Union[List[dict], Exception]]]:
+        # keep a bounded window of tasks so that sweeps over huge address lists don't schedule everything up front
+        window = 2 * self.max_concurrency
+        pending = {}
+        addresses = iter(addresses)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < window:
+                    try:
+                        address = next(addresses)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[asyncio.ensure_future(method(address))] = address
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    address = pending.pop(task)
+                    if task.exception() is None:
+                        yield address, task.result()
+                    elif return_exceptions:
+                        yield address, task.exception()
+                    else:
+                        raise task.exception()
+        finally:
+            # runs when a lookup raises, and when the consumer stops early and the generator is closed, so that tasks
+            # still in the window don't keep running against the API
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def gather_outbound_witnesses(self, addresses: Iterable[str], return_exceptions: bool = False) -> AsyncIterator[Tuple[str, Union[List[dict], Exception]]]:
+        """
+        Concurrently get the outbound witnesses for many hotspots, yielding (address, witnesses) pairs as they complete.
+
+        :param addresses: The hotspot addresses.
+        :param return_exceptions: If True, failed lookups are yielded as (address, exception) instead of raising.
+        :return: An async iterator of (address, witnesses) tuples, in completion order.
+        """
+        return self._gather(self.get_outbound_witnesses_for_hotspot, addresses, return_exceptions)
+
+    def gather_inbound_witnesses(self, addresses: Iterable[str], return_exceptions: bool = False) -> AsyncIterator[Tuple[str, Union[List[dict], Exception]]]:
+        """
+        Concurrently get the inbound witnesses for many hotspots, yielding (address, witnesses) pairs as they complete.
+
+        :param addresses: The hotspot addresses.
+        :param return_exceptions: If True, failed lookups are yielded as (address, exception) instead of raising.
+        :return: An async iterator of (address, witnesses) tuples, in completion order.
+        """
+        return self._gather(self.get_inbound_witnesses_for_hotspot, addresses, return_exceptions)
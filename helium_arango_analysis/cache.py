@@ -0,0 +1,233 @@
+import os
+import time
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Any
+from urllib.parse import urlencode
+
+
+def make_cache_key(url: str, params: Optional[dict] = None) -> str:
+    """
+    Build a cache key from a request url and its query parameters. Parameters set to None are dropped (as they are
+    never sent to the server) and the rest are sorted, so equivalent queries share a key.
+
+    :param url: The request url.
+    :param params: (optional) The query parameters.
+    :return: The cache key.
+    """
+    if not params:
+        return url
+    params = sorted((k, v) for k, v in params.items() if v is not None)
+    return url + '?' + urlencode(params)
+
+
+def _time_to_live(params: Optional[dict], ttl: Optional[float], recent_window: float, now: float) -> Optional[float]:
+    # responses for windows that closed more than recent_window seconds ago are immutable, everything else gets the ttl
+    max_time = (params or {}).get('max_time')
+    if max_time is not None and max_time < now - recent_window:
+        return None
+    return ttl
+
+
+class DiskCache(object):
+    def __init__(self, path: str = '~/.cache/helium_arango_analysis/responses.sqlite', ttl: float = 300,
+                 recent_window: float = 3600, max_bytes: int = 512 * 1024 ** 2):
+        """
+        A persistent, size-bounded LRU cache of raw HTTP responses, stored in SQLite.
+
+        Responses for time windows that closed more than recent_window seconds ago (i.e. max_time is in the past) are
+        immutable and never expire. Everything else, e.g. open-ended/recent windows or the hotspot graphs, expires after ttl seconds.
+
+        :param path: The SQLite database file. Parent directories are created if needed.
+        :param ttl: Time-to-live in seconds for responses that may still change.
+        :param recent_window: Windows with max_time within this many seconds of now are considered recent and get a TTL.
+        :param max_bytes: The max total size of stored (compressed) responses. Least recently used entries are evicted first.
+        """
+        path = os.path.expanduser(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.recent_window = recent_window
+        self.max_bytes = max_bytes
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                           'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                           'expires_at REAL, last_access REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+
+    def expires_at(self, params: Optional[dict], now: Optional[float] = None) -> Optional[float]:
+        """
+        Compute the expiry time of a response given its query parameters.
+
+        :param params: The query parameters.
+        :param now: (optional) The current UTC timestamp.
+        :return: The UTC timestamp at which the response expires, or None if it never does.
+        """
+        now = time.time() if now is None else now
+        ttl = _time_to_live(params, self.ttl, self.recent_window, now)
+        return None if ttl is None else now + ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up a response.
+
+        :param key: The cache key, see make_cache_key.
+        :return: The raw response body, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self.hits += 1
+        return zlib.decompress(value)
+
+    def set(self, key: str, value: bytes, params: Optional[dict] = None):
+        """
+        Store a response, evicting least recently used entries if the cache is over max_bytes.
+
+        :param key: The cache key, see make_cache_key.
+        :param value: The raw response body.
+        :param params: (optional) The query parameters, used to decide when the response expires.
+        """
+        now = time.time()
+        value = zlib.compress(value)
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                               (key, value, len(value), self.expires_at(params, now), now))
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._conn.execute('BEGIN')
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._conn.execute('COMMIT')
+
+    def clear(self):
+        """
+        Remove all stored responses and reset the counters.
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self) -> dict:
+        """
+        Get cache statistics.
+
+        :return: A dict with hit/miss/eviction counters, the number of stored entries and their total (compressed) size in bytes.
+        """
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': entries, 'bytes': size}
+
+    def close(self):
+        self._conn.close()
+
+
+class MemoryCache(object):
+    def __init__(self, max_entries: int = 128, max_bytes: int = 256 * 1024 ** 2, ttl: Optional[float] = 300,
+                 recent_window: float = 3600):
+        """
+        An in-process LRU cache of parsed responses, bounded by entry count and approximate size.
+
+        Cached responses are returned as-is (not copied), so repeat queries are effectively free. Do not mutate them in place.
+
+        Expiry follows DiskCache: responses for time windows that closed more than recent_window seconds ago never expire,
+        and everything else, e.g. open-ended/recent windows, receipts or the hotspot graphs, expires after ttl seconds.
+
+        :param max_entries: The max number of cached responses.
+        :param max_bytes: The max total size of cached responses, approximated by the size of their raw response bodies.
+        :param ttl: (optional) Time-to-live in seconds for responses that may still change. If None, nothing expires,
+            e.g. for caching values that are derived from immutable inputs.
+        :param recent_window: Windows with max_time within this many seconds of now are considered recent and get a TTL.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.recent_window = recent_window
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a parsed response.
+
+        :param key: The cache key, see make_cache_key.
+        :return: The parsed response, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._bytes -= self._entries.pop(key)[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, size: int, params: Optional[dict] = None):
+        """
+        Store a parsed response, evicting least recently used entries if the cache is over either bound.
+
+        :param key: The cache key, see make_cache_key.
+        :param value: The parsed response.
+        :param size: The approximate size of the response in bytes, e.g. the length of the raw response body.
+        :param params: (optional) The query parameters, used to decide when the response expires.
+        """
+        if size > self.max_bytes:
+            return
+        ttl = _time_to_live(params, self.ttl, self.recent_window, time.time())
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, None if ttl is None else time.monotonic() + ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all cached responses and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self) -> dict:
+        """
+        Get cache statistics.
+
+        :return: A dict with hit/miss/eviction counters, the number of cached entries and their approximate total size in bytes.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self._entries), 'bytes': self._bytes}
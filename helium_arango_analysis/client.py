@@ -1,36 +1,225 @@
+import json
+import time
+import functools
 import requests
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+from urllib3.util.retry import Retry
+from typing import Optional, List, Tuple, Union, Iterable, Iterator, Dict
 from datetime import datetime
-import networkx as nx
+from urllib.parse import urlsplit
+from helium_arango_analysis.graph_utils import witnesses_to_graph, merge_graphs
+from helium_arango_analysis.cache import DiskCache, MemoryCache, make_cache_key
+from helium_arango_analysis import instrumentation
+
+
+class HeliumArangoHTTPError(Exception):
+    """Base class for errors raised by HeliumArangoHTTPClient."""
+
+
+class RequestFailedError(HeliumArangoHTTPError):
+    def __init__(self, url: str, status_code: int, detail: str = None):
+        """
+        Raised when the HTTP API responds with a non-200 status code.
+
+        :param url: The requested url.
+        :param status_code: The HTTP status code of the response.
+        :param detail: (optional) The response body, if any.
+        """
+        self.url = url
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(f'Request to {url} failed with status {status_code}. Please check your query parameters and make sure that the HTTP API is online.')
+
+
+class RequestTimeoutError(HeliumArangoHTTPError):
+    """Raised when the HTTP API does not respond within the configured timeout."""
+
+
+class ServerUnavailableError(HeliumArangoHTTPError):
+    """Raised when the HTTP API cannot be reached, even after retrying."""
+
+
+def request_route(url: str, base_url: str) -> str:
+    """
+    :param url: A request url.
+    :param base_url: The client's base url.
+    :return: The url path relative to base_url, with addresses replaced by {address}, e.g. /hotspots/{address}/outbound.
+    """
+    path = url[len(base_url):] if url.startswith(base_url) else url
+    return '/'.join('{address}' if len(part) > 30 else part for part in path.split('/'))
+
+
+class _static_compatible(object):
+    """
+    A method that can also be called on the class, like the staticmethod it replaced. Called on the class, it runs on a
+    throwaway client with the default settings for the url's server.
+    """
+    def __init__(self, method):
+        self.method = method
+        functools.update_wrapper(self, method)
+
+    def __get__(self, instance, owner=None):
+        if instance is not None:
+            return self.method.__get__(instance, owner)
+
+        @functools.wraps(self.method)
+        def call(url: str, *args, **kwargs):
+            parts = urlsplit(url)
+            with owner(f'{parts.scheme}://{parts.netloc}') as client:
+                return self.method(client, url, *args, **kwargs)
+        return call
 
 
 class HeliumArangoHTTPClient(object):
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, pool_size: int = 10, timeout: Union[float, Tuple[float, float]] = (5, 60),
+                 max_retries: int = 3, backoff_factor: float = 0.5, session: Optional[requests.Session] = None,
+                 cache: Optional[DiskCache] = None, memory_cache: Optional[MemoryCache] = None):
         """
         Initialize a Helium Arango HTTP Client.
 
+        All requests share a single pooled, keep-alive session, so repeated queries reuse TCP/TLS connections.
+
         :param base_url: The base url for the helium-arango-http server, e.g. http://localhost:8000/
+        :param pool_size: The max number of connections kept alive to the server. Should be >= the number of threads sharing the client.
+        :param timeout: Per-request timeout in seconds, either a single value or a (connect, read) tuple.
+        :param max_retries: The max number of retries on connection errors and 5xx responses.
+        :param backoff_factor: Exponential backoff factor between retries, i.e. sleeps of {backoff_factor} * 2^(retry - 1) seconds.
+        :param session: (optional) A preconfigured requests.Session to use instead of the default pooled session.
+        :param cache: (optional) A DiskCache to serve repeated queries from, e.g. fixed historical payment windows.
+        :param memory_cache: (optional) A MemoryCache of parsed responses, checked before the DiskCache. Useful for interactive sessions.
         """
         if base_url[-1] == '/':
             base_url = base_url[:-1]
         self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cache = cache
+        self.memory_cache = memory_cache
+        self.session = session if session is not None else self._make_session(pool_size, max_retries, backoff_factor)
 
     @staticmethod
-    def get_request(url: str, params: dict=None):
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            raise Exception('Request failed. Please check your query parameters and make sure that the HTTP API is online.')
-        else:
-            return response.json()
+    def _make_session(pool_size: int, max_retries: int, backoff_factor: float) -> requests.Session:
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'})
+        return session
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-    def get_payments_from_account(self, address: str, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> List[dict]:
+    @staticmethod
+    def resolve_params(params: Optional[dict]) -> Optional[dict]:
+        # open-ended windows (max_time=None) run up to now. Resolve them at request time rather than at import time,
+        # and after computing the cache key, so that repeated open-ended queries share a key.
+        if params and 'max_time' in params and params['max_time'] is None:
+            params = {**params, 'max_time': int(datetime.utcnow().timestamp())}
+        return params
+
+    @_static_compatible
+    def get_request(self, url: str, params: dict = None):
+        if not instrumentation.hooks:
+            return self._get_request(url, params)
+        info = {'phases': {}, 'bytes': 0, 'cache': None}
+        start = time.perf_counter()
+        try:
+            result = self._get_request(url, params, info)
+        except Exception as e:
+            instrumentation.emit(instrumentation.Event('client.get_request', time.perf_counter() - start, info['phases'],
+                                                       info['bytes'], route=request_route(url, self.base_url), cache=info['cache'], error=type(e).__name__))
+            raise
+        nodes, edges = instrumentation.graph_size(result)
+        instrumentation.emit(instrumentation.Event('client.get_request', time.perf_counter() - start, info['phases'],
+                                                   info['bytes'], nodes, edges, request_route(url, self.base_url), info['cache']))
+        return result
+
+    def _get_request(self, url: str, params: Optional[dict], info: Optional[dict] = None):
+        # info, if given, collects phase timings, payload bytes and the cache outcome for instrumentation
+        key = make_cache_key(url, params) if self.memory_cache is not None or self.cache is not None else None
+        start = time.perf_counter() if info is not None else None
+        if self.memory_cache is not None:
+            result = self.memory_cache.get(key)
+            if result is not None:
+                if info is not None:
+                    info['phases']['cache'] = time.perf_counter() - start
+                    info['cache'] = 'memory_hit'
+                return result
+        if self.cache is not None:
+            content = self.cache.get(key)
+            if content is not None:
+                if info is not None:
+                    info['phases']['cache'] = time.perf_counter() - start
+                    info['cache'], info['bytes'] = 'disk_hit', len(content)
+                return self._parse(key, content, params, info)
+        if info is not None:
+            if key is not None:
+                info['phases']['cache'] = time.perf_counter() - start
+                info['cache'] = 'miss'
+            start = time.perf_counter()
+        params = self.resolve_params(params)
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.exceptions.Timeout as e:
+            raise RequestTimeoutError(f'Request to {url} timed out after {self.timeout} seconds.') from e
+        except requests.exceptions.ConnectionError as e:
+            # once read retries are exhausted, urllib3's MaxRetryError surfaces as a ConnectionError wrapping the timeout.
+            # NewConnectionError (e.g. connection refused) subclasses ConnectTimeoutError, so rule it out explicitly
+            reason = getattr(e.args[0] if e.args else None, 'reason', None)
+            if isinstance(reason, (ReadTimeoutError, ConnectTimeoutError)) and not isinstance(reason, NewConnectionError):
+                raise RequestTimeoutError(f'Request to {url} timed out after {self.timeout} seconds.') from e
+            raise ServerUnavailableError(f'Could not connect to {url}. Please make sure that the HTTP API is online.') from e
+        except requests.exceptions.RequestException as e:
+            raise HeliumArangoHTTPError(f'Request to {url} failed: {e}') from e
+        finally:
+            if info is not None:
+                info['phases']['network'] = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RequestFailedError(url, response.status_code, response.text)
+        if info is not None:
+            info['bytes'] = len(response.content)
+        if self.cache is not None:
+            self.cache.set(key, response.content, params)
+        return self._parse(key, response.content, params, info)
+
+    def _parse(self, key: Optional[str], content: bytes, params: Optional[dict], info: Optional[dict] = None):
+        start = time.perf_counter() if info is not None else None
+        result = json.loads(content)
+        if info is not None:
+            info['phases']['decode'] = time.perf_counter() - start
+        if self.memory_cache is not None:
+            self.memory_cache.set(key, result, len(content), params)
+        return result
+
+    def get_payments_from_account(self, address: str, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
         """
         Get payments from an account, grouped by payee and sorted by amount. Also includes payment counts for each.
 
         :param address: The HNT wallet address of the payer.
         :param limit: The max number of payees to return.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -41,14 +230,14 @@ class HeliumArangoHTTPClient(object):
         url = self.base_url + f'/payments/{address}/from'
         return self.get_request(url, params=params)
 
-    def get_payments_to_account(self, address: str, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> List[dict]:
+    def get_payments_to_account(self, address: str, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
         """
         Get payments to an account, grouped by payer and sorted by amount. Also includes payment counts for each.
 
         :param address: The HNT wallet address of the payee.
         :param limit: The max number of payers to return.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -59,13 +248,13 @@ class HeliumArangoHTTPClient(object):
         url = self.base_url + f'/payments/{address}/to'
         return self.get_request(url, params=params)
 
-    def get_top_payment_totals(self, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> List[dict]:
+    def get_top_payment_totals(self, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
         """
         Get top payments (payer, payee) pair, sorted by total HNT paid.
 
         :param limit: The max number of payment pairs to return.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -76,13 +265,13 @@ class HeliumArangoHTTPClient(object):
         url = self.base_url + f'/payments/totals'
         return self.get_request(url, params=params)
 
-    def get_top_payment_counts(self, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> List[dict]:
+    def get_top_payment_counts(self, limit: Optional[int] = 100, min_time: Optional[int] = 0, max_time: Optional[int] = None) -> List[dict]:
         """
         Get top payments (payer, payee) pair, sorted by number of payments.
 
         :param limit: The max number of payment pairs to return.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -94,13 +283,13 @@ class HeliumArangoHTTPClient(object):
         return self.get_request(url, params=params)
 
     def get_top_payers(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
-                               max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> List[dict]:
+                               max_time: Optional[int] = None) -> List[dict]:
         """
         Get top payers, sorted by amount paid. Also includes payment counts for each.
 
         :param limit: The max number of payers to return.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -112,13 +301,13 @@ class HeliumArangoHTTPClient(object):
         return self.get_request(url, params=params)
 
     def get_top_payees(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
-                               max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> List[dict]:
+                               max_time: Optional[int] = None) -> List[dict]:
         """
         Get top payees, sorted by amount received. Also includes payment counts for each.
 
         :param limit: The max number of payees to return.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -130,13 +319,13 @@ class HeliumArangoHTTPClient(object):
         return self.get_request(url, params=params)
 
     def get_top_payers_graph(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
-                               max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> dict:
+                               max_time: Optional[int] = None) -> dict:
         """
         Starting with the top payers, generate the graph of token flow from these accounts.
 
         :param limit: The max number of top payers to seed the graph.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -148,13 +337,13 @@ class HeliumArangoHTTPClient(object):
         return self.get_request(url, params=params)
 
     def get_top_payees_graph(self, limit: Optional[int] = 100, min_time: Optional[int] = 0,
-                               max_time: Optional[int] = int(datetime.utcnow().timestamp())) -> dict:
+                               max_time: Optional[int] = None) -> dict:
         """
         Starting with the top payees, generate the graph of token flow to these accounts.
 
         :param limit: The max number of top payees to seed the graph.
         :param min_time: The minimum UTC timestamp to consider.
-        :param max_time: The maximum UTC timestamp to consider.
+        :param max_time: The maximum UTC timestamp to consider. Defaults to now.
         :return:
         """
         params = {
@@ -182,13 +371,23 @@ class HeliumArangoHTTPClient(object):
         url = self.base_url + f'/hotspots/coords/graph'
         return self.get_request(url, params=params)
 
-    def get_witness_graph_in_hex(self, hex: str) -> dict:
+    def get_witness_graph_in_hex(self, hex: str, tile_resolution: Optional[int] = None, max_workers: Optional[int] = None) -> dict:
         """
-        Generate the witness graph within a hex. Be careful not to choose an excessively large hex when querying over an HTTP API.
+        Generate the witness graph within a hex. Be careful not to choose an excessively large hex when querying over an HTTP API,
+        or set tile_resolution to split it into child hexes that are fetched in parallel and merged.
 
         :param hex: An h3 hex to consider.
+        :param tile_resolution: (optional) If set and finer than the hex's resolution, fetch the graph of each child hex at this resolution
+            and merge them, with nodes merged by address and edges deduplicated by (_from, _to).
+        :param max_workers: (optional) The number of threads used to fetch tiles. Defaults to the connection pool size.
         :return:
         """
+        if tile_resolution is not None:
+            import h3
+            if tile_resolution > h3.h3_get_resolution(hex):
+                tiles = h3.h3_to_children(hex, tile_resolution)
+                with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as executor:
+                    return merge_graphs(executor.map(self.get_witness_graph_in_hex, tiles))
         params = {
             'hex': hex
         }
@@ -230,5 +429,100 @@ class HeliumArangoHTTPClient(object):
         url = self.base_url + f'/hotspots/receipts'
         return self.get_request(url, params=params)
 
+    def iter_witness_receipts(self, address: Optional[str] = None, page_size: int = 1000, since: Optional[int] = None,
+                              max_page_size: int = 100000) -> Iterator[dict]:
+        """
+        Iterate over witness receipts page by page, in ascending time order, so only one page is held in memory at a time.
+
+        This relies on the server filtering receipts by min_time and returning each page oldest first. A page that is out
+        of order, or that starts before min_time, raises a HeliumArangoHTTPError rather than being re-sorted, since the
+        server would then be returning an arbitrary subset of the receipts.
 
+        Each page is requested with min_time set to the latest receipt time seen so far. If more than a page of receipts
+        share one timestamp, that timestamp is re-requested with a doubled limit until it fits in a page, up to
+        max_page_size. To resume an interrupted iteration, pass the time of the last receipt processed as since; receipts
+        at exactly that time may be yielded again.
 
+        :param address: (optional) A hotspot address to focus on.
+        :param page_size: The number of receipts to request per page.
+        :param since: (optional) The UTC timestamp (receipt time) to start from.
+        :param max_page_size: The largest limit to re-request a single timestamp with.
+        :return: An iterator over receipts.
+        """
+        url = self.base_url + f'/hotspots/receipts'
+        cursor, seen_at_cursor = since, set()
+        limit = page_size
+        while True:
+            params = {
+                'address': address,
+                'limit': limit,
+                'min_time': cursor
+            }
+            page = self.get_request(url, params=params)['receipts']
+            times = [r['time'] for r in page]
+            if any(a > b for a, b in zip(times, times[1:])) or (times and cursor is not None and times[0] < cursor):
+                raise HeliumArangoHTTPError(f'{url} returned receipts out of ascending time order from min_time {cursor}.')
+            if len(page) >= limit and times[0] == times[-1]:
+                # a full page at a single timestamp may have cut that timestamp short, and paging on min_time can't
+                # get past it, so re-request it with a larger limit
+                if limit >= max_page_size:
+                    raise HeliumArangoHTTPError(f'More than {max_page_size} receipts at time {times[0]} in {url}.')
+                limit = min(limit * 2, max_page_size)
+                continue
+            new = [r for r in page if cursor is None or r['time'] > cursor or (r['time'] == cursor and r['_key'] not in seen_at_cursor)]
+            for receipt in new:
+                if receipt['time'] != cursor:
+                    cursor, seen_at_cursor = receipt['time'], set()
+                seen_at_cursor.add(receipt['_key'])
+                yield receipt
+            # a short page means we've caught up
+            if len(page) < limit:
+                return
+            if not new:
+                raise HeliumArangoHTTPError(f'Paging through {url} made no progress past time {cursor}.')
+            limit = page_size
+
+    def get_witnesses_for_hotspots(self, addresses: Iterable[str], direction: str = 'outbound', max_workers: Optional[int] = None) -> Tuple[Dict[str, List[dict]], Dict[str, Exception]]:
+        """
+        Get the witnesses for many hotspots at once, fanning the lookups out over a bounded thread pool that shares the client's pooled connections.
+
+        :param addresses: The hotspot addresses.
+        :param direction: One of {'outbound', 'inbound'}, see get_outbound_witnesses_for_hotspot and get_inbound_witnesses_for_hotspot.
+        :param max_workers: (optional) The number of threads. Defaults to the connection pool size.
+        :return: A tuple of (witnesses, errors) dicts keyed by address. Failed lookups are collected in errors instead of aborting the batch.
+        """
+        methods = {'outbound': self.get_outbound_witnesses_for_hotspot, 'inbound': self.get_inbound_witnesses_for_hotspot}
+        if direction not in methods:
+            raise ValueError(f'direction argument must be one of {set(methods)}')
+        method = methods[direction]
+        results, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as executor:
+            futures = {executor.submit(method, address): address for address in set(addresses)}
+            for future in as_completed(futures):
+                address = futures[future]
+                try:
+                    results[address] = future.result()
+                except Exception as e:
+                    errors[address] = e
+        return results, errors
+
+    def get_witness_graph_for_hotspots(self, addresses: Iterable[str], direction: str = 'outbound', max_workers: Optional[int] = None) -> Tuple[dict, Dict[Union[str, Tuple[str, str]], Exception]]:
+        """
+        Build one merged witness graph around many hotspots, with nodes merged by address and deduplicated edges.
+
+        :param addresses: The hotspot addresses.
+        :param direction: One of {'outbound', 'inbound', 'both'}.
+        :param max_workers: (optional) The number of threads. Defaults to the connection pool size.
+        :return: A tuple of ({'nodes': [...], 'edges': [...]}, errors). The graph is ready for create_networkx_graph.
+            errors are keyed by address, or by (address, direction) for direction='both', so that an address failing
+            in both directions keeps both errors.
+        """
+        if direction == 'both':
+            addresses = list(addresses)
+            outbound, outbound_errors = self.get_witness_graph_for_hotspots(addresses, 'outbound', max_workers)
+            inbound, inbound_errors = self.get_witness_graph_for_hotspots(addresses, 'inbound', max_workers)
+            errors = {(address, 'outbound'): e for address, e in outbound_errors.items()}
+            errors.update(((address, 'inbound'), e) for address, e in inbound_errors.items())
+            return merge_graphs([outbound, inbound]), errors
+        witnesses, errors = self.get_witnesses_for_hotspots(addresses, direction, max_workers)
+        return witnesses_to_graph(witnesses, direction), errors
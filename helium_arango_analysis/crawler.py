@@ -0,0 +1,187 @@
+import os
+import json
+from array import array
+from itertools import chain
+from typing import Optional, Iterable, Dict, List, Iterator
+from helium_arango_analysis.client import HeliumArangoHTTPClient, HeliumArangoHTTPError
+from helium_arango_analysis.graph_utils import merge_graphs
+from helium_arango_analysis.interning import AddressIndex
+
+
+CHECKPOINT_VERSION = 2
+
+
+class WitnessCrawler(object):
+    def __init__(self, client: HeliumArangoHTTPClient, seeds: Iterable[str] = (), direction: str = 'both',
+                 max_depth: int = 2, max_nodes: Optional[int] = None, batch_size: int = 1000,
+                 checkpoint_path: Optional[str] = None, max_workers: Optional[int] = None):
+        """
+        A breadth-first crawl of the witness graph around seed hotspots, up to max_depth hops. Each level's frontier is
+        expanded in batches of concurrent lookups (see HeliumArangoHTTPClient.get_witness_graph_for_hotspots), and every
+        discovered hotspot is recorded in an AddressIndex, so no hotspot is fetched twice. The frontiers are int32 id
+        arrays into the index.
+
+        If checkpoint_path is set, the crawl is logged there as JSON lines: a header with the seeds, then one line per
+        batch with its size, nodes, edges and errors. Each batch is appended once, so checkpointing costs O(batch), and
+        the crawled nodes and edges are kept on disk rather than in memory. Creating a crawler with an existing
+        checkpoint replays the log to restore the visited set and frontier, so an interrupted crawl is continued by
+        re-running the same code. The budgets (max_depth, max_nodes) are taken from the arguments, so they can be raised
+        to extend a finished crawl.
+
+        :param client: The HeliumArangoHTTPClient to fetch witnesses with.
+        :param seeds: The hotspot addresses to start from, at depth 0. Ignored when resuming from a checkpoint.
+        :param direction: One of {'outbound', 'inbound', 'both'}, which witness edges to follow.
+        :param max_depth: The max number of hops from the seeds. Hotspots at depth max_depth are included in the graph,
+            with their edges to shallower hotspots, but not expanded.
+        :param max_nodes: (optional) The max number of hotspots to expand, i.e. to look up witnesses for.
+        :param batch_size: The number of hotspots to expand per batch of concurrent requests, and per checkpoint line.
+        :param checkpoint_path: (optional) A JSON lines file to log the crawl to and resume it from.
+        :param max_workers: (optional) The number of threads per batch. Defaults to the client's connection pool size.
+        """
+        valid_directions = {'outbound', 'inbound', 'both'}
+        if direction not in valid_directions:
+            raise ValueError(f'direction argument must be one of {valid_directions}')
+        self.client = client
+        self.direction = direction
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.index = AddressIndex()
+        self.depth = 0
+        self.expanded = 0
+        self.errors = {}
+        self._n_seeds = 0
+        self._frontier = array('i')
+        self._position = 0
+        self._next_frontier = array('i')
+        self._graphs = []
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self._replay(checkpoint_path)
+        else:
+            for address in seeds:
+                if address not in self.index:
+                    self._frontier.append(self.index.add(address))
+            self._n_seeds = len(self.index)
+            if checkpoint_path is not None:
+                self._append({'version': CHECKPOINT_VERSION, 'direction': direction, 'seeds': self.index.addresses()})
+
+    @property
+    def done(self) -> bool:
+        """
+        True once the crawl has reached max_depth or max_nodes, or run out of hotspots to expand.
+        """
+        if self.max_nodes is not None and self.expanded >= self.max_nodes:
+            return True
+        if self._position < len(self._frontier):
+            return self.depth >= self.max_depth
+        return not self._next_frontier or self.depth + 1 >= self.max_depth
+
+    def step(self) -> int:
+        """
+        Expand the next batch of the frontier, moving on to the next level once the current one is exhausted.
+
+        :return: The number of hotspots expanded, 0 if the crawl is done.
+        """
+        if self.done:
+            return 0
+        size = self.batch_size if self.max_nodes is None else min(self.batch_size, self.max_nodes - self.expanded)
+        if self._position < len(self._frontier):
+            batch = self._frontier[self._position:self._position + size]
+        else:
+            batch = self._next_frontier[:size]
+
+        graph, errors = self.client.get_witness_graph_for_hotspots(self.index.addresses(batch), self.direction,
+                                                                   self.max_workers)
+        if self.checkpoint_path is not None:
+            self._append({'size': len(batch), 'nodes': graph['nodes'], 'edges': graph['edges'],
+                          'errors': [[*_error_key(key), str(e)] for key, e in errors.items()]})
+        else:
+            self._graphs.append(graph)
+        self._apply(len(batch), graph['nodes'], errors)
+        return len(batch)
+
+    def _apply(self, size: int, nodes: List[dict], errors: dict):
+        # advance the crawl state past a batch of size hotspots, given the batch's nodes. Used by step and to replay a log
+        if self._position >= len(self._frontier):
+            self.depth += 1
+            self._frontier, self._position, self._next_frontier = self._next_frontier, 0, array('i')
+        self._position += size
+        self.expanded += size
+        # the nodes come in lookup completion order, so new hotspots are sorted to keep max_nodes crawls deterministic
+        for address in sorted({node['address'] for node in nodes if node['address'] not in self.index}):
+            self._next_frontier.append(self.index.add(address))
+        self.errors.update(errors)
+
+    def crawl(self) -> Dict[str, List[dict]]:
+        """
+        Run the crawl until done.
+
+        :return: The crawled graph, see to_graph.
+        """
+        while self.step():
+            pass
+        return self.to_graph()
+
+    def to_graph(self) -> Dict[str, List[dict]]:
+        """
+        :return: The graph crawled so far as {'nodes': [...], 'edges': [...]}, ready for create_networkx_graph,
+            make_sparse_graph or save_snapshot. With a checkpoint, it is read back from the log. Failed lookups are in
+            errors.
+        """
+        seeds = {'nodes': [{'address': address} for address in self.index.addresses(range(self._n_seeds))], 'edges': []}
+        graphs = self._read_log() if self.checkpoint_path is not None else self._graphs
+        return merge_graphs(chain([seeds], graphs))
+
+    def to_networkx(self, name: str = None):
+        """
+        :param name: (optional) The name of graph.
+        :return: The graph crawled so far as a networkx directed graph, see create_networkx_graph.
+        """
+        from helium_arango_analysis.adapters import create_networkx_graph
+        nodes, edges = self.to_graph().values()
+        return create_networkx_graph(nodes, edges, name=name)
+
+    def _append(self, record: dict):
+        with open(self.checkpoint_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def _read_log(self) -> Iterator[dict]:
+        with open(self.checkpoint_path) as f:
+            next(f)
+            for line in f:
+                yield json.loads(line)
+
+    def _replay(self, path: str):
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != CHECKPOINT_VERSION:
+                raise ValueError(f'{path} is not a version {CHECKPOINT_VERSION} crawl checkpoint')
+            if header['direction'] != self.direction:
+                raise ValueError(f"{path} is a checkpoint of a crawl with direction='{header['direction']}'")
+            for address in header['seeds']:
+                self._frontier.append(self.index.add(address))
+            self._n_seeds = len(self.index)
+            end = f.tell()
+            while True:
+                line = f.readline()
+                # a line without a newline is a batch that was cut off mid-write, so it is dropped and re-fetched
+                if not line.endswith(b'\n'):
+                    break
+                record = json.loads(line)
+                errors = {_error_key_from(address, direction): HeliumArangoHTTPError(message)
+                          for address, direction, message in record['errors']}
+                self._apply(record['size'], record['nodes'], errors)
+                end = f.tell()
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+
+
+def _error_key(key) -> list:
+    # errors are keyed by address, or by (address, direction) for direction='both'
+    return list(key) if isinstance(key, tuple) else [key, None]
+
+
+def _error_key_from(address: str, direction: Optional[str]):
+    return address if direction is None else (address, direction)
@@ -0,0 +1,180 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Iterable
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+from helium_arango_analysis.client import HeliumArangoHTTPClient
+from helium_arango_analysis.geo import rssi_residual, node_coordinates, h3_cells
+from helium_arango_analysis.sparse import SparseGraph, make_sparse_graph
+
+
+def score_witness_graph(sg: SparseGraph, tx_power_dbm: float = 27., frequency_mhz: float = 915., residual_threshold_db: float = 15.,
+                        min_clique_size: int = 4, clique_weight: float = 1.) -> dict:
+    """
+    Score hotspots in a witness graph for likely gaming, using two vectorized signals:
+
+    - RSSI anomalies: free space is the best case for a radio link, so an RSSI more than residual_threshold_db above the
+      free-space prediction for the reported distance_m suggests a spoofed location or fabricated receipt. Each hotspot
+      gets the fraction of its (inbound and outbound) witness edges that are anomalous.
+    - Reciprocal cliques: hotspots that all witness each other, i.e. dense clusters in the graph of reciprocal edges.
+      Each hotspot with at least min_clique_size - 1 reciprocal neighbors gets its local clustering coefficient there.
+
+    :param sg: A SparseGraph with edge features 'rssi' and 'distance_m', and optionally node feature 'gain' (in tenths of dBi).
+    :param tx_power_dbm: The transmit power in dBm.
+    :param frequency_mhz: The carrier frequency in MHz.
+    :param residual_threshold_db: How far above the free-space prediction an RSSI must be to count as anomalous.
+    :param min_clique_size: The smallest clique of mutual witnesses considered suspicious.
+    :param clique_weight: The weight of the clique signal relative to the RSSI anomaly fraction in the final score.
+    :return: A dict of per-hotspot arrays, aligned with sg.addresses: score, anomaly_fraction, max_residual_db (nan for
+        hotspots without any scored edge), reciprocal_degree and clustering.
+    """
+    return _score(sg, tx_power_dbm, frequency_mhz, residual_threshold_db, min_clique_size, clique_weight)[0]
+
+
+def _score(sg: SparseGraph, tx_power_dbm: float = 27., frequency_mhz: float = 915., residual_threshold_db: float = 15.,
+           min_clique_size: int = 4, clique_weight: float = 1.):
+    n = sg.n_nodes
+    rows, cols = sg.edge_index
+    rssi = sg.e[:, sg.edge_features.index('rssi')].astype(np.float64)
+    distance_m = sg.e[:, sg.edge_features.index('distance_m')].astype(np.float64)
+    gain = np.zeros(n)
+    if 'gain' in sg.node_features:
+        gain = sg.x[:, sg.node_features.index('gain')]
+
+    residual = rssi_residual(rssi, distance_m, gain[rows], gain[cols], tx_power_dbm, frequency_mhz)
+    valid = ~np.isnan(residual)
+    anomalous = valid & (residual > residual_threshold_db)
+
+    degree = np.bincount(rows[valid], minlength=n) + np.bincount(cols[valid], minlength=n)
+    n_anomalous = np.bincount(rows[anomalous], minlength=n) + np.bincount(cols[anomalous], minlength=n)
+    anomaly_fraction = np.divide(n_anomalous, degree, out=np.zeros(n), where=degree > 0)
+    max_residual = np.full(n, np.nan)
+    np.fmax.at(max_residual, rows[valid], residual[valid])
+    np.fmax.at(max_residual, cols[valid], residual[valid])
+
+    # reciprocal graph: keep only edges that exist in both directions, without self loops
+    a = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    r = a.multiply(a.T).tocsr()
+    r.setdiag(0)
+    r.eliminate_zeros()
+    reciprocal_degree = np.asarray(r.sum(axis=1)).ravel()
+    triangles = np.asarray((r @ r).multiply(r).sum(axis=1)).ravel() / 2
+    possible = reciprocal_degree * (reciprocal_degree - 1) / 2
+    clustering = np.divide(triangles, possible, out=np.zeros(n), where=possible > 0)
+    clique_score = np.where(reciprocal_degree >= min_clique_size - 1, clustering, 0.)
+
+    scores = {
+        'score': anomaly_fraction + clique_weight * clique_score,
+        'anomaly_fraction': anomaly_fraction,
+        'max_residual_db': max_residual,
+        'reciprocal_degree': reciprocal_degree,
+        'clustering': clustering
+    }
+    return scores, r
+
+
+def suspicious_hotspots(sg: SparseGraph, min_score: float = 0.5, **kwargs) -> dict:
+    """
+    Rank the suspicious hotspots in a witness graph and group them into sets of mutual witnesses.
+
+    :param sg: A SparseGraph, see score_witness_graph.
+    :param min_score: The minimum score for a hotspot to be reported.
+    :param kwargs: Passed to score_witness_graph.
+    :return: A dict with 'hotspots', a list of per-hotspot dicts sorted by decreasing score, and 'sets', a list of lists of
+        addresses: the connected groups of suspicious hotspots in the reciprocal witness graph, largest first.
+    """
+    scores, r = _score(sg, **kwargs)
+    flagged = np.flatnonzero(scores['score'] >= min_score)
+    flagged = flagged[np.argsort(-scores['score'][flagged], kind='stable')]
+    hotspots = [{'address': sg.addresses[i], **{k: float(v[i]) for k, v in scores.items()}} for i in flagged]
+
+    sets = []
+    if len(flagged):
+        sub = r[flagged][:, flagged]
+        n_sets, labels = csgraph.connected_components(sub, directed=False)
+        for label in range(n_sets):
+            members = flagged[labels == label]
+            if len(members) > 1:
+                sets.append([sg.addresses[i] for i in members])
+        sets.sort(key=len, reverse=True)
+    return {'hotspots': hotspots, 'sets': sets}
+
+
+_worker_client = None
+
+
+def _init_worker(base_url: str, client_kwargs: dict):
+    global _worker_client
+    _worker_client = HeliumArangoHTTPClient(base_url, **client_kwargs)
+
+
+def _detect_tile(tile: str, min_score: float, score_kwargs: dict) -> dict:
+    import h3
+    nodes, edges = _worker_client.get_witness_graph_in_hex(tile).values()
+    # the graph includes witnesses outside the tile, which neighboring tiles also see, so only hotspots located in the
+    # tile are counted and reported here. h3 cells don't nest exactly, so a hotspot is placed by the parent of its
+    # finest cell, which puts it in exactly one tile of any tiling
+    resolution = h3.h3_get_resolution(tile)
+    cells = h3_cells(*node_coordinates(nodes).T, 15)
+    in_tile = {node['address'] for node, cell in zip(nodes, cells) if cell is not None and h3.h3_to_parent(cell, resolution) == tile}
+    result = {'tile': tile, 'n_hotspots': len(in_tile), 'n_edges': len(edges), 'hotspots': [], 'sets': []}
+    if edges:
+        sg = make_sparse_graph(nodes, edges, node_features=['gain'], edge_features=['rssi', 'distance_m'], dtype=np.float64)
+        suspicious = suspicious_hotspots(sg, min_score, **score_kwargs)
+        result['hotspots'] = [hotspot for hotspot in suspicious['hotspots'] if hotspot['address'] in in_tile]
+        result['sets'] = [s for s in suspicious['sets'] if not in_tile.isdisjoint(s)]
+    return result
+
+
+def detect_gaming(base_url: str, hexes: Iterable[str], tile_resolution: Optional[int] = None, min_score: float = 0.5,
+                  max_workers: Optional[int] = None, client_kwargs: Optional[dict] = None, **score_kwargs) -> dict:
+    """
+    Run gaming detection over a region tile by tile, across multiple processes. Each worker fetches one tile's witness
+    graph with get_witness_graph_in_hex, scores it and keeps only the suspicious hotspots, so memory stays bounded by
+    the largest tile regardless of the size of the region.
+
+    Witness edges that cross tile boundaries are only seen if the server includes them in a tile's graph, so prefer
+    tiles that are large relative to typical witness distances. Each hotspot is counted and reported only by the tile
+    its geo_location falls in, though its witnesses in other tiles still contribute to its score.
+
+    :param base_url: The base url for the helium-arango-http server. Each worker process opens its own client.
+    :param hexes: The h3 hexes covering the region.
+    :param tile_resolution: (optional) If set, split each hex into child tiles at this resolution.
+    :param min_score: The minimum score for a hotspot to be reported.
+    :param max_workers: (optional) The number of processes. Defaults to the number of CPUs.
+    :param client_kwargs: (optional) Keyword arguments for HeliumArangoHTTPClient, e.g. {'timeout': 120}.
+    :param score_kwargs: Passed to score_witness_graph, e.g. frequency_mhz=868.
+    :return: A dict with 'hotspots' (ranked, each with its tile), 'sets' (without duplicates across tiles),
+        'stats' (tile/hotspot/edge counts, elapsed seconds and hotspots_per_second throughput) and 'errors', the
+        exceptions of any tiles that failed, keyed by tile.
+    """
+    tiles = list(hexes)
+    if tile_resolution is not None:
+        import h3
+        tiles = [child for hex in tiles for child in h3.h3_to_children(hex, tile_resolution)]
+
+    start = time.perf_counter()
+    hotspots, sets = {}, {}
+    stats = {'tiles': len(tiles), 'hotspots': 0, 'edges': 0}
+    errors = {}
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(base_url, client_kwargs or {})) as executor:
+        futures = {executor.submit(_detect_tile, tile, min_score, score_kwargs): tile for tile in tiles}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                errors[futures[future]] = e
+                continue
+            stats['hotspots'] += result['n_hotspots']
+            stats['edges'] += result['n_edges']
+            sets.update((frozenset(s), s) for s in result['sets'])
+            for hotspot in result['hotspots']:
+                hotspots[hotspot['address']] = {**hotspot, 'tile': result['tile']}
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['hotspots_per_second'] = stats['hotspots'] / stats['seconds'] if stats['seconds'] > 0 else 0.
+    ranked = sorted(hotspots.values(), key=lambda h: h['score'], reverse=True)
+    return {'hotspots': ranked, 'sets': sorted(sets.values(), key=len, reverse=True), 'stats': stats, 'errors': errors}
@@ -0,0 +1,175 @@
+from typing import List, Dict, Optional, Iterable
+import numpy as np
+from helium_arango_analysis.interning import AddressIndex
+from helium_arango_analysis.sparse import SparseGraph, align_records
+
+
+EARTH_RADIUS_M = 6371008.8
+# numeric edge features computed by edge_geo_features, in column order for add_geo_features
+GEO_FEATURES = ('distance_m', 'fspl_db', 'rssi_residual_db')
+
+
+def haversine(lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distance between points on a spherical earth, element-wise.
+
+    :param lon1: Longitudes of the first points, in degrees.
+    :param lat1: Latitudes of the first points, in degrees.
+    :param lon2: Longitudes of the second points, in degrees.
+    :param lat2: Latitudes of the second points, in degrees.
+    :return: The distances in meters. NaN where any coordinate is NaN.
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lon1, lat1, lon2, lat2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(h, 1.)))
+
+
+def free_space_path_loss(distance_m: np.ndarray, frequency_mhz: float = 915.) -> np.ndarray:
+    """
+    Free-space path loss in dB, the best case for a radio link. Distances are clamped to at least 1 m.
+
+    :param distance_m: The link distances in meters.
+    :param frequency_mhz: The carrier frequency in MHz, e.g. 915 for US915 or 868 for EU868.
+    :return: The path loss in dB.
+    """
+    distance_km = np.maximum(np.asarray(distance_m, dtype=np.float64), 1.) / 1000
+    return 20 * np.log10(distance_km) + 20 * np.log10(frequency_mhz) + 32.44
+
+
+def rssi_residual(rssi: np.ndarray, distance_m: np.ndarray, tx_gain: Optional[np.ndarray] = None,
+                  rx_gain: Optional[np.ndarray] = None, tx_power_dbm: float = 27., frequency_mhz: float = 915.) -> np.ndarray:
+    """
+    How far a received signal is above the free-space prediction. Since free space is the best case, large positive
+    residuals suggest a wrong distance, i.e. a misasserted location or fabricated receipt.
+
+    :param rssi: The received signal strengths in dBm.
+    :param distance_m: The link distances in meters.
+    :param tx_gain: (optional) The transmitter antenna gains, in tenths of dBi as in the hotspot 'gain' field.
+    :param rx_gain: (optional) The receiver antenna gains, in tenths of dBi.
+    :param tx_power_dbm: The transmit power in dBm.
+    :param frequency_mhz: The carrier frequency in MHz.
+    :return: The residuals in dB.
+    """
+    expected = tx_power_dbm - free_space_path_loss(distance_m, frequency_mhz)
+    for gain in (tx_gain, rx_gain):
+        if gain is not None:
+            expected = expected + np.nan_to_num(np.asarray(gain, dtype=np.float64)) / 10
+    return np.asarray(rssi, dtype=np.float64) - expected
+
+
+def node_coordinates(nodes: Iterable[Optional[dict]]) -> np.ndarray:
+    """
+    :param nodes: Hotspot dicts with a 'geo_location' GeoJSON point. None entries, e.g. from align_records, are allowed.
+    :return: An (n, 2) float64 array of [lon, lat], NaN for nodes without a location.
+    """
+    coordinates = [((node or {}).get('geo_location') or {}).get('coordinates') for node in nodes]
+    return np.array([(np.nan, np.nan) if c is None else c[:2] for c in coordinates], dtype=np.float64).reshape(-1, 2)
+
+
+def h3_cells(lon: np.ndarray, lat: np.ndarray, resolution: int) -> List[Optional[str]]:
+    """
+    The h3 cell containing each point. Each distinct point is only converted once.
+
+    :param lon: Longitudes in degrees.
+    :param lat: Latitudes in degrees.
+    :param resolution: The h3 resolution, 0-15.
+    :return: A list of h3 cells, None for points with NaN coordinates.
+    """
+    import h3
+
+    points = np.column_stack([np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)])
+    if not len(points):
+        return []
+    unique, inverse = np.unique(points, axis=0, return_inverse=True)
+    cells = [None if np.isnan(x) or np.isnan(y) else h3.geo_to_h3(y, x, resolution) for x, y in unique.tolist()]
+    return [cells[i] for i in inverse.ravel()]
+
+
+def _strip_collection(address: str) -> str:
+    # receipts reference hotspots by arango document id, e.g. 'hotspots/112RP2...'
+    return address.rpartition('/')[2]
+
+
+def edge_geo_features(nodes: List[dict], edges: List[dict], rssi_key: str = 'rssi', tx_power_dbm: float = 27.,
+                      frequency_mhz: float = 915., h3_resolution: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Compute geo features for a list of edges in one vectorized pass: the great-circle distance between the endpoints'
+    geo_location, the free-space path loss over it and the RSSI residual (see rssi_residual). Works on graph edges as
+    well as raw receipts from get_sample_of_recent_witness_receipts, whose endpoints are 'hotspots/<address>' ids
+    and whose RSSI is under 'signal'.
+
+    :param nodes: The hotspots, with 'address', 'geo_location' and optionally 'gain'. Must cover the edge endpoints,
+        e.g. the nodes of the same graph response. Endpoints without a node get NaN features.
+    :param edges: The edges or receipts, with '_from' (transmitter) and '_to' (receiver).
+    :param rssi_key: The RSSI key of the edges, e.g. 'rssi' for graph edges or 'signal' for receipts.
+    :param tx_power_dbm: The transmit power in dBm.
+    :param frequency_mhz: The carrier frequency in MHz.
+    :param h3_resolution: (optional) If set, also return 'from_h3' and 'to_h3', the endpoint cells at this resolution.
+    :return: A dict of arrays aligned with edges: 'distance_m', 'fspl_db' and 'rssi_residual_db', plus the h3 cells.
+    """
+    index = AddressIndex(node['address'] for node in nodes)
+    records = align_records(nodes, index)
+    if edges and '/' in edges[0]['_from']:
+        rows = index.ids(_strip_collection(edge['_from']) for edge in edges)
+        cols = index.ids(_strip_collection(edge['_to']) for edge in edges)
+    else:
+        rows = index.ids(edge['_from'] for edge in edges)
+        cols = index.ids(edge['_to'] for edge in edges)
+    # endpoints without a node were appended to the index, so pad them with missing values
+    records += [None] * (len(index) - len(records))
+    lonlat = node_coordinates(records)
+    gain = np.array([np.nan if r is None or r.get('gain') is None else r['gain'] for r in records], dtype=np.float64)
+    rssi = np.array([np.nan if edge.get(rssi_key) is None else edge[rssi_key] for edge in edges], dtype=np.float64)
+
+    features = _geo_features(lonlat, gain, rows, cols, rssi, tx_power_dbm, frequency_mhz)
+    if h3_resolution is not None:
+        cells = h3_cells(lonlat[:, 0], lonlat[:, 1], h3_resolution)
+        features['from_h3'] = [cells[i] for i in rows]
+        features['to_h3'] = [cells[i] for i in cols]
+    return features
+
+
+def _geo_features(lonlat: np.ndarray, gain: np.ndarray, rows: np.ndarray, cols: np.ndarray, rssi: np.ndarray,
+                  tx_power_dbm: float, frequency_mhz: float) -> Dict[str, np.ndarray]:
+    distance_m = haversine(lonlat[rows, 0], lonlat[rows, 1], lonlat[cols, 0], lonlat[cols, 1])
+    return {
+        'distance_m': distance_m,
+        'fspl_db': free_space_path_loss(distance_m, frequency_mhz),
+        'rssi_residual_db': rssi_residual(rssi, distance_m, gain[rows], gain[cols], tx_power_dbm, frequency_mhz)
+    }
+
+
+def add_geo_features(sg: SparseGraph, nodes: List[dict], features: Iterable[str] = GEO_FEATURES,
+                     tx_power_dbm: float = 27., frequency_mhz: float = 915.) -> SparseGraph:
+    """
+    Append geo features as edge feature columns of a SparseGraph, e.g. before sparse_to_spektral_graph or
+    convert_sparse_to_torch_geometric. The RSSI residual uses the graph's 'rssi' edge feature, so it is NaN unless
+    sg was built with 'rssi' in edge_features.
+
+    :param sg: The SparseGraph, see make_sparse_graph.
+    :param nodes: The hotspots the graph was built from, with 'geo_location' and optionally 'gain'.
+    :param features: The features to append, any of GEO_FEATURES. Columns that sg already has are replaced.
+    :param tx_power_dbm: The transmit power in dBm.
+    :param frequency_mhz: The carrier frequency in MHz.
+    :return: A new SparseGraph, with the features appended to e and edge_features (and e_mask, if set).
+    """
+    features = list(features)
+    invalid = set(features) - set(GEO_FEATURES)
+    if invalid:
+        raise ValueError(f'features must be a subset of {set(GEO_FEATURES)}')
+    records = align_records([node for node in nodes if node['address'] in sg.index], sg.index)
+    lonlat = node_coordinates(records)
+    gain = np.array([np.nan if r is None or r.get('gain') is None else r['gain'] for r in records], dtype=np.float64)
+    rssi = sg.e[:, sg.edge_features.index('rssi')] if 'rssi' in sg.edge_features else np.full(sg.n_edges, np.nan)
+    rows, cols = sg.edge_index
+    computed = _geo_features(lonlat, gain, rows, cols, rssi, tx_power_dbm, frequency_mhz)
+
+    dtype = np.float32 if sg.e is None else sg.e.dtype
+    keep = [j for j, key in enumerate(sg.edge_features) if key not in features]
+    e = np.column_stack([np.empty((sg.n_edges, 0), dtype=dtype) if sg.e is None else sg.e[:, keep]] +
+                        [computed[key].astype(dtype) for key in features])
+    e_mask = sg.e_mask
+    if e_mask is not None:
+        e_mask = np.column_stack([e_mask[:, keep]] + [~np.isnan(computed[key]) for key in features])
+    edge_features = [sg.edge_features[j] for j in keep] + features
+    return sg._replace(e=e, edge_features=edge_features, e_mask=e_mask)
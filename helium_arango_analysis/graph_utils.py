@@ -0,0 +1,56 @@
+from typing import List, Dict, Iterable
+
+
+WITNESS_EDGE_KEYS = ('rssi', 'snr', 'distance_m', 'time', 'timestamp', 'datarate', 'frequency', 'channel')
+
+
+def merge_graphs(graphs: Iterable[dict]) -> dict:
+    """
+    Merge several graph responses into one. Nodes are merged by address (later attributes win) and edges are
+    deduplicated by (_from, _to), keeping the first occurrence.
+
+    :param graphs: An iterable of {'nodes': [...], 'edges': [...]} graph responses.
+    :return: The merged graph, in the same {'nodes': [...], 'edges': [...]} shape.
+    """
+    nodes, edges = {}, {}
+    for graph in graphs:
+        for node in graph['nodes']:
+            if node['address'] in nodes:
+                nodes[node['address']].update(node)
+            else:
+                nodes[node['address']] = dict(node)
+        for edge in graph['edges']:
+            edges.setdefault((edge['_from'], edge['_to']), edge)
+    return {'nodes': list(nodes.values()), 'edges': list(edges.values())}
+
+
+def witnesses_to_graph(witnesses: Dict[str, List[dict]], direction: str) -> dict:
+    """
+    Build a witness graph from per-hotspot witness lists, e.g. the output of
+    HeliumArangoHTTPClient.get_witnesses_for_hotspots.
+
+    :param witnesses: A dict mapping each queried hotspot address to its list of witnesses.
+    :param direction: One of {'outbound', 'inbound'}, the direction the witness lists were queried in.
+    :return: A {'nodes': [...], 'edges': [...]} graph ready for create_networkx_graph.
+    """
+    valid_directions = {'outbound', 'inbound'}
+    if direction not in valid_directions:
+        raise ValueError(f'direction argument must be one of {valid_directions}')
+    nodes, edges = {}, {}
+    for address, witness_list in witnesses.items():
+        nodes.setdefault(address, {'address': address})
+        for witness in witness_list:
+            node = nodes.setdefault(witness['address'], {'address': witness['address']})
+            node.update((k, v) for k, v in witness.items() if k not in WITNESS_EDGE_KEYS)
+            if direction == 'outbound':
+                key = (address, witness['address'])
+            else:
+                key = (witness['address'], address)
+            if key in edges:
+                continue
+            edge = {'_from': key[0], '_to': key[1]}
+            for k in WITNESS_EDGE_KEYS:
+                if k in witness:
+                    edge[k] = witness[k]
+            edges[key] = edge
+    return {'nodes': list(nodes.values()), 'edges': list(edges.values())}
@@ -0,0 +1,243 @@
+import time
+import threading
+import functools
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Event(NamedTuple):
+    """
+    One instrumented call, e.g. an HTTP request or a graph build.
+
+    name identifies the call, e.g. 'client.get_request' or 'adapters.create_networkx_graph'. phases maps a phase
+    ('cache', 'network', 'decode' or 'build') to the seconds spent in it, and seconds is the wall time of the whole call.
+    route is the normalized request path, for requests. cache is the cache outcome of a request ('memory_hit',
+    'disk_hit' or 'miss'), or None if no cache is configured. error is the exception type name if the call raised.
+    """
+    name: str
+    seconds: float
+    phases: Dict[str, float]
+    bytes: int = 0
+    nodes: Optional[int] = None
+    edges: Optional[int] = None
+    route: Optional[str] = None
+    cache: Optional[str] = None
+    error: Optional[str] = None
+
+
+# instrumented code checks this list before doing any timing, so with no hooks the overhead is one truthiness check
+hooks: List[Callable[[Event], None]] = []
+
+
+def add_hook(hook: Callable[[Event], None]):
+    """
+    Register a callback, called with an Event after every instrumented call. Hooks run synchronously, in the calling
+    thread, so they should be fast and thread-safe. Exceptions raised by hooks propagate to the caller.
+
+    :param hook: The callback.
+    """
+    hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[Event], None]):
+    """
+    :param hook: A callback registered with add_hook.
+    """
+    hooks.remove(hook)
+
+
+def emit(event: Event):
+    for hook in list(hooks):
+        hook(event)
+
+
+def graph_size(obj) -> Tuple[Optional[int], Optional[int]]:
+    """
+    :param obj: A networkx graph, SparseGraph, spektral Graph, torch-geometric Data, {'nodes', 'edges'} graph response,
+        a list of any of these, or a tuple whose first item is one of these.
+    :return: The (nodes, edges) counts, or (None, None) if obj isn't a graph.
+    """
+    if hasattr(obj, 'number_of_nodes'):
+        return obj.number_of_nodes(), obj.number_of_edges()
+    if hasattr(obj, 'n_nodes') and hasattr(obj, 'n_edges'):
+        return obj.n_nodes, obj.n_edges
+    if hasattr(obj, 'num_nodes') and hasattr(obj, 'num_edges'):
+        return obj.num_nodes, obj.num_edges
+    if isinstance(obj, dict) and isinstance(obj.get('nodes'), list) and isinstance(obj.get('edges'), list):
+        return len(obj['nodes']), len(obj['edges'])
+    if isinstance(obj, tuple) and obj:
+        return graph_size(obj[0])
+    if isinstance(obj, list) and obj:
+        sizes = [graph_size(item) for item in obj]
+        if all(n is not None for n, _ in sizes):
+            return sum(n for n, _ in sizes), sum(e for _, e in sizes)
+    return None, None
+
+
+def instrumented(name: str, phase: str = 'build', size_of: str = 'result'):
+    """
+    Decorate a function to emit an Event per call while hooks are registered.
+
+    :param name: The event name.
+    :param phase: The phase the function's time is attributed to.
+    :param size_of: Where to take node/edge counts from, see graph_size: 'result' or 'first_arg'.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not hooks:
+                return f(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = f(*args, **kwargs)
+            except Exception as e:
+                seconds = time.perf_counter() - start
+                emit(Event(name, seconds, {phase: seconds}, error=type(e).__name__))
+                raise
+            seconds = time.perf_counter() - start
+            if size_of == 'result':
+                nodes, edges = graph_size(result)
+            else:
+                nodes, edges = graph_size(args[0]) if args else (None, None)
+            emit(Event(name, seconds, {phase: seconds}, nodes=nodes, edges=edges))
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def span(name: str, phase: str = 'build'):
+    """
+    Time a block of your own pipeline as an Event, e.g.
+
+        with span('notebook.feature_engineering'):
+            ...
+
+    :param name: The event name.
+    :param phase: The phase the block's time is attributed to.
+    """
+    if not hooks:
+        yield
+        return
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        emit(Event(name, seconds, {phase: seconds}, error=error))
+
+
+class Aggregator(object):
+    def __init__(self):
+        """
+        A hook that aggregates events by (name, route): call counts, errors, time per phase, bytes, node/edge counts
+        and cache outcomes. Register it with add_hook, or use it as a context manager, e.g.
+
+            with Aggregator() as stats:
+                client.get_witness_graph_in_hex(hex)
+            print(stats.summary())
+        """
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __call__(self, event: Event):
+        with self._lock:
+            stats = self._stats.get((event.name, event.route))
+            if stats is None:
+                stats = self._stats[(event.name, event.route)] = {
+                    'calls': 0, 'errors': 0, 'seconds': 0., 'max_seconds': 0., 'bytes': 0, 'nodes': 0, 'edges': 0,
+                    'phases': defaultdict(float), 'cache': defaultdict(int)
+                }
+            stats['calls'] += 1
+            stats['errors'] += event.error is not None
+            stats['seconds'] += event.seconds
+            stats['max_seconds'] = max(stats['max_seconds'], event.seconds)
+            stats['bytes'] += event.bytes
+            stats['nodes'] += event.nodes or 0
+            stats['edges'] += event.edges or 0
+            for phase, seconds in event.phases.items():
+                stats['phases'][phase] += seconds
+            if event.cache is not None:
+                stats['cache'][event.cache] += 1
+
+    def __enter__(self):
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc):
+        remove_hook(self)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def stats(self) -> Dict[Tuple[str, Optional[str]], dict]:
+        """
+        :return: A copy of the aggregated stats, keyed by (name, route).
+        """
+        with self._lock:
+            return {key: {**s, 'phases': dict(s['phases']), 'cache': dict(s['cache'])} for key, s in self._stats.items()}
+
+    def summary(self) -> str:
+        """
+        :return: A plain-text table with one row per (name, route), sorted by total time.
+        """
+        phases = ('cache', 'network', 'decode', 'build')
+        header = f"{'call':<52} {'calls':>7} {'errors':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9} " + \
+                 ' '.join(f'{p + " s":>9}' for p in phases) + f" {'MB':>8} {'nodes':>9} {'edges':>10} {'cache hit':>9}"
+        lines = [header, '-' * len(header)]
+        for (name, route), s in sorted(self.stats().items(), key=lambda item: -item[1]['seconds']):
+            label = name if route is None else f'{name} {route}'
+            lookups = sum(s['cache'].values())
+            hits = lookups - s['cache'].get('miss', 0)
+            hit_rate = f'{hits / lookups:.0%}' if lookups else '-'
+            lines.append(f"{label[:52]:<52} {s['calls']:>7} {s['errors']:>6} {s['seconds']:>9.3f} "
+                         f"{1000 * s['seconds'] / s['calls']:>9.2f} {1000 * s['max_seconds']:>9.2f} " +
+                         ' '.join(f"{s['phases'].get(p, 0.):>9.3f}" for p in phases) +
+                         f" {s['bytes'] / 1e6:>8.2f} {s['nodes']:>9} {s['edges']:>10} {hit_rate:>9}")
+        return '\n'.join(lines)
+
+    def to_prometheus(self, prefix: str = 'helium_arango') -> str:
+        """
+        :param prefix: The metric name prefix.
+        :return: The stats in the Prometheus text exposition format, as counters labeled by name and route.
+        """
+        metrics = {
+            'calls_total': ('counter', 'Instrumented calls.'),
+            'errors_total': ('counter', 'Instrumented calls that raised.'),
+            'seconds_total': ('counter', 'Wall time of instrumented calls, in seconds.'),
+            'phase_seconds_total': ('counter', 'Time per phase of instrumented calls, in seconds.'),
+            'bytes_total': ('counter', 'Response payload bytes.'),
+            'nodes_total': ('counter', 'Nodes in built graphs.'),
+            'edges_total': ('counter', 'Edges in built graphs.'),
+            'cache_total': ('counter', 'Cache outcomes of requests.'),
+        }
+        samples = defaultdict(list)
+        for (name, route), s in sorted(self.stats().items(), key=lambda item: (item[0][0], item[0][1] or '')):
+            labels = f'name="{_escape(name)}"' + ('' if route is None else f',route="{_escape(route)}"')
+            samples['calls_total'].append((labels, s['calls']))
+            samples['errors_total'].append((labels, s['errors']))
+            samples['seconds_total'].append((labels, s['seconds']))
+            for phase, seconds in sorted(s['phases'].items()):
+                samples['phase_seconds_total'].append((f'{labels},phase="{phase}"', seconds))
+            samples['bytes_total'].append((labels, s['bytes']))
+            samples['nodes_total'].append((labels, s['nodes']))
+            samples['edges_total'].append((labels, s['edges']))
+            for outcome, count in sorted(s['cache'].items()):
+                samples['cache_total'].append((f'{labels},outcome="{outcome}"', count))
+
+        lines = []
+        for metric, (type, help) in metrics.items():
+            lines.append(f'# HELP {prefix}_{metric} {help}')
+            lines.append(f'# TYPE {prefix}_{metric} {type}')
+            lines.extend(f'{prefix}_{metric}{{{labels}}} {value}' for labels, value in samples[metric])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
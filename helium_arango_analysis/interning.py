@@ -0,0 +1,76 @@
+import sys
+from typing import Iterable, Iterator, List, Optional
+import numpy as np
+
+
+class AddressIndex(object):
+    def __init__(self, addresses: Iterable[str] = ()):
+        """
+        A compact, append-only mapping between hotspot/account addresses and dense int32 ids.
+
+        Each address string is interned and stored once, so graphs keyed by id (see create_networkx_graph and
+        make_sparse_graph) don't repeat 51-52 character strings across edges, attribute dicts and adjacency structures.
+        Supports dict-style lookups, e.g. index[address] and address in index.
+
+        :param addresses: (optional) Addresses to add up front, in id order.
+        """
+        self._ids = {}
+        self._addresses = []
+        for address in addresses:
+            self.add(address)
+
+    def add(self, address: str) -> int:
+        """
+        Get the id of an address, assigning the next id if it is new.
+
+        :param address: The address.
+        :return: The id.
+        """
+        i = self._ids.get(address)
+        if i is None:
+            address = sys.intern(address)
+            i = self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+        return i
+
+    def ids(self, addresses: Iterable[str], add: bool = True) -> np.ndarray:
+        """
+        Get the ids of many addresses at once.
+
+        :param addresses: The addresses.
+        :param add: If True, assign ids to new addresses. Otherwise, unknown addresses raise a KeyError.
+        :return: An int32 array of ids.
+        """
+        lookup = self.add if add else self._ids.__getitem__
+        return np.fromiter((lookup(address) for address in addresses), dtype=np.int32)
+
+    def address(self, i: int) -> str:
+        """
+        :param i: An id.
+        :return: The address with this id.
+        """
+        return self._addresses[i]
+
+    def addresses(self, ids: Optional[Iterable[int]] = None) -> List[str]:
+        """
+        :param ids: (optional) An iterable or array of ids.
+        :return: The addresses with these ids, or all addresses in id order if ids is not given.
+        """
+        if ids is None:
+            return list(self._addresses)
+        return [self._addresses[i] for i in ids]
+
+    def get(self, address: str, default: Optional[int] = None) -> Optional[int]:
+        return self._ids.get(address, default)
+
+    def __getitem__(self, address: str) -> int:
+        return self._ids[address]
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._ids
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._addresses)
@@ -1,8 +1,12 @@
-from networkx.drawing.layout import spring_layout, spiral_layout, kamada_kawai_layout
+import hashlib
+from networkx.drawing.layout import spring_layout, spiral_layout, kamada_kawai_layout, rescale_layout
 import networkx as nx
-import plotly.graph_objects as go
 import numpy as np
-from pyvis.network import Network
+import scipy.sparse as sp
+from typing import Dict, Optional, Tuple
+from helium_arango_analysis.cache import MemoryCache
+from helium_arango_analysis.interning import AddressIndex
+from helium_arango_analysis.instrumentation import instrumented
 
 
 def set_new_attr_from_existing(g: nx.DiGraph, in_attr: str, out_attr: str, attr_type: str) -> nx.DiGraph:
@@ -31,12 +35,36 @@ def set_new_attr_from_existing(g: nx.DiGraph, in_attr: str, out_attr: str, attr_
 
 
 def plot_graph_simple(g: nx.DiGraph):
+    from pyvis.network import Network
+
     net = Network()
     net.from_nx(g)
     net.show('example.html')
 
 
-def plot_witness_graph_plotly(G: nx.DiGraph):
+@instrumented('plotting.plot_witness_graph_plotly', size_of='first_arg')
+def plot_witness_graph_plotly(G: nx.DiGraph, webgl: bool = False, mapbox: bool = False, bundle_resolution: Optional[int] = None,
+                              max_edges: Optional[int] = None, seed: Optional[int] = None):
+    """
+    Plot a witness graph with hotspots at their coordinates.
+
+    The default SVG rendering struggles past ~20k edges. Setting any of webgl, mapbox, bundle_resolution or max_edges
+    switches to a high-volume mode that builds the traces with NumPy and renders them with WebGL, see
+    witness_graph_figure.
+
+    :param G: The witness graph, see create_networkx_graph.
+    :param webgl: If True, render with WebGL Scattergl traces.
+    :param mapbox: If True, render WebGL traces over an OpenStreetMap basemap.
+    :param bundle_resolution: (optional) Bundle edges by the h3 cells of their endpoints at this resolution.
+    :param max_edges: (optional) The max number of edges to draw.
+    :param seed: (optional) The random seed for downsampling edges.
+    """
+    import plotly.graph_objects as go
+
+    if webgl or mapbox or bundle_resolution is not None or max_edges is not None:
+        witness_graph_figure(G, mapbox, bundle_resolution, max_edges, seed).show()
+        return
+
     edge_x = []
     edge_y = []
     for edge in G.edges():
@@ -107,8 +135,287 @@ def plot_witness_graph_plotly(G: nx.DiGraph):
     fig.show()
 
 
-def _get_token_flow_traces(G: nx.DiGraph):
-    positions = spring_layout(G)
+def _node_lonlat(G: nx.DiGraph) -> Tuple[list, np.ndarray]:
+    nodes = list(G.nodes)
+    coordinates = [data.get('coordinates') or (data.get('geo_location') or {}).get('coordinates') for _, data in G.nodes(data=True)]
+    lonlat = np.array([(np.nan, np.nan) if c is None else c[:2] for c in coordinates], dtype=np.float64).reshape(-1, 2)
+    return nodes, lonlat
+
+
+def _line_coordinates(x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # one segment per edge, separated by NaN gaps, in a single trace
+    gap = np.full(len(x0), np.nan)
+    return np.column_stack([x0, x1, gap]).ravel(), np.column_stack([y0, y1, gap]).ravel()
+
+
+def _bundle_edges(lonlat: np.ndarray, rows: np.ndarray, cols: np.ndarray, resolution: int):
+    import h3
+    from helium_arango_analysis.geo import h3_cells
+
+    cells = np.array(h3_cells(lonlat[:, 0], lonlat[:, 1], resolution), dtype=object)
+    located = np.flatnonzero(cells != None)
+    codes = np.full(len(cells), -1)
+    unique_cells, codes[located] = np.unique(cells[located].astype(str), return_inverse=True)
+    cell_from, cell_to = codes[rows], codes[cols]
+    # edges within a single cell collapse to a point, so drop them along with unlocated endpoints
+    keep = (cell_from >= 0) & (cell_to >= 0) & (cell_from != cell_to)
+    pairs, counts = np.unique(cell_from[keep] * len(unique_cells) + cell_to[keep], return_counts=True)
+    centers = np.array([h3.h3_to_geo(cell)[::-1] for cell in unique_cells.tolist()], dtype=np.float64).reshape(-1, 2)
+    return centers[pairs // len(unique_cells)], centers[pairs % len(unique_cells)], counts
+
+
+@instrumented('plotting.witness_graph_figure', size_of='first_arg')
+def witness_graph_figure(G: nx.DiGraph, mapbox: bool = False, bundle_resolution: Optional[int] = None,
+                         max_edges: Optional[int] = None, seed: Optional[int] = None) -> 'plotly.graph_objects.Figure':
+    """
+    Build a WebGL figure of a witness graph, for graphs too large for plot_witness_graph_plotly's default mode.
+    Coordinates come from each node's 'coordinates' or 'geo_location' attribute. Traces are built with NumPy, with all
+    edges of the same line width in a single trace.
+
+    :param G: The witness graph, see create_networkx_graph.
+    :param mapbox: If True, draw over an OpenStreetMap basemap with Scattermapbox. Otherwise use Scattergl.
+    :param bundle_resolution: (optional) If set, replace the edges by one segment per pair of h3 cells at this resolution
+        between the cell centers, with wider lines for pairs with more witness edges. Edges within a cell are dropped.
+    :param max_edges: (optional) The max number of edges (or bundles) to draw. Edges are sampled at random, bundles are
+        kept in decreasing order of edge count.
+    :param seed: (optional) The random seed for sampling edges.
+    :return: The plotly figure.
+    """
+    import plotly.graph_objects as go
+
+    nodes, lonlat = _node_lonlat(G)
+    position = {node: i for i, node in enumerate(nodes)}
+    rows = np.fromiter((position[u] for u, _ in G.edges), dtype=np.int64, count=G.number_of_edges())
+    cols = np.fromiter((position[v] for _, v in G.edges), dtype=np.int64, count=G.number_of_edges())
+    # color nodes by their out-degree in the full graph, before edges are sampled
+    degree = np.bincount(rows, minlength=len(nodes))
+
+    if bundle_resolution is None:
+        if max_edges is not None and len(rows) > max_edges:
+            sample = np.sort(np.random.default_rng(seed).choice(len(rows), size=max_edges, replace=False))
+            rows, cols = rows[sample], cols[sample]
+        groups = [(lonlat[rows], lonlat[cols], 0.5)]
+        title = '<br>Hotspot Witness Graph'
+    else:
+        start, end, counts = _bundle_edges(lonlat, rows, cols, bundle_resolution)
+        if max_edges is not None and len(counts) > max_edges:
+            top = np.sort(np.argsort(-counts, kind='stable')[:max_edges])
+            start, end, counts = start[top], end[top], counts[top]
+        # plotly lines have one width per trace, so bin the bundles by log2 of their edge count
+        bins = np.floor(np.log2(counts)).astype(np.int64) if len(counts) else counts
+        groups = [(start[bins == b], end[bins == b], 0.5 + float(b)) for b in np.unique(bins)]
+        title = f'<br>Hotspot Witness Graph, bundled at h3 resolution {bundle_resolution}'
+
+    scatter = go.Scattermapbox if mapbox else go.Scattergl
+    data = []
+    for start, end, width in groups:
+        lon, lat = _line_coordinates(start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+        line = dict(width=width, color='#888')
+        data.append(scatter(lon=lon, lat=lat, line=line, hoverinfo='none', mode='lines') if mapbox
+                    else scatter(x=lon, y=lat, line=line, hoverinfo='none', mode='lines'))
+
+    names = [G.nodes[node].get('name', node) for node in nodes]
+    marker = dict(showscale=True, colorscale='YlGnBu', reversescale=True, color=degree,
+                  size=6, colorbar=dict(thickness=15, title='Node Connections', xanchor='left'))
+    data.append(scatter(lon=lonlat[:, 0], lat=lonlat[:, 1], mode='markers', hoverinfo='text', text=names, marker=marker)
+                if mapbox else scatter(x=lonlat[:, 0], y=lonlat[:, 1], mode='markers', hoverinfo='text', text=names, marker=marker))
+
+    layout = dict(title=title, showlegend=False, hovermode='closest', margin=dict(b=20, l=5, r=5, t=40))
+    if mapbox:
+        center = dict(lon=float(np.nanmean(lonlat[:, 0])), lat=float(np.nanmean(lonlat[:, 1]))) if len(nodes) else None
+        layout['mapbox'] = dict(style='open-street-map', center=center, zoom=6)
+    else:
+        layout['xaxis'] = dict(showgrid=False, zeroline=False, showticklabels=False)
+        layout['yaxis'] = dict(showgrid=False, zeroline=False, showticklabels=False, scaleanchor='x')
+    return go.Figure(data=data, layout=go.Layout(**layout))
+
+
+def structure_hash(G: nx.Graph) -> str:
+    """
+    :param G: The graph.
+    :return: A hash of the graph's nodes and (undirected) edges, independent of insertion order and attributes.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update('\n'.join(sorted(map(str, G.nodes))).encode())
+    h.update(b'\0')
+    h.update('\n'.join(sorted('\t'.join(sorted((str(u), str(v)))) for u, v in G.edges)).encode())
+    return h.hexdigest()
+
+
+def _mesh_repulsion(pos: np.ndarray, k: float, free: np.ndarray, cells: int, chunk_size: int = 2048) -> np.ndarray:
+    # Fruchterman-Reingold repulsion approximated on a cells x cells grid: each node is repelled by the center of mass
+    # of every occupied cell, weighted by its node count, instead of by every other node
+    n = len(pos)
+    low, high = pos.min(axis=0), pos.max(axis=0)
+    ij = np.minimum(((pos - low) / np.maximum(high - low, 1e-9) * cells).astype(np.int64), cells - 1)
+    occupied, cell = np.unique(ij[:, 0] * cells + ij[:, 1], return_inverse=True)
+    cell = cell.ravel()
+    counts = np.bincount(cell).astype(np.float64)
+    centers = np.column_stack([np.bincount(cell, weights=pos[:, d]) for d in range(2)]) / counts[:, None]
+
+    displacement = np.zeros_like(pos)
+    free_nodes = np.flatnonzero(free)
+    for start in range(0, len(free_nodes), chunk_size):
+        nodes = free_nodes[start:start + chunk_size]
+        rows = np.arange(len(nodes))
+        delta = pos[nodes, None, :] - centers[None, :, :]
+        weight = np.broadcast_to(counts, (len(nodes), len(counts))).copy()
+        # a node's own cell repels it from the center of mass of the other nodes in that cell
+        own = cell[nodes]
+        others = counts[own] - 1
+        own_center = (centers[own] * counts[own, None] - pos[nodes]) / np.maximum(others, 1)[:, None]
+        delta[rows, own] = pos[nodes] - own_center
+        weight[rows, own] = others
+        distance2 = np.maximum((delta ** 2).sum(axis=2), 1e-4)
+        displacement[nodes] = k ** 2 * (delta * (weight / distance2)[:, :, None]).sum(axis=1)
+    return displacement
+
+
+@instrumented('plotting.sparse_layout', size_of='first_arg')
+def sparse_layout(G: nx.Graph, pos: Optional[Dict] = None, fixed: Optional[list] = None, iterations: int = 50,
+                  seed: Optional[int] = None, cells: int = 32) -> Dict:
+    """
+    A force-directed (Fruchterman-Reingold) layout that scales to large graphs. Attraction runs along the sparse
+    adjacency, and repulsion is approximated on a grid of cells, Barnes-Hut style, so each iteration is
+    O(n * cells ** 2 + edges) instead of networkx's O(n ** 2).
+
+    :param G: The graph. Edge directions are ignored.
+    :param pos: (optional) Initial positions for some or all nodes. The others start at random.
+    :param fixed: (optional) Nodes to keep at their initial positions. Requires pos. If set, positions aren't rescaled.
+    :param iterations: The number of iterations.
+    :param seed: (optional) The random seed for the initial positions.
+    :param cells: The number of grid cells per axis used to approximate repulsion.
+    :return: A dict of {node: array([x, y])}, rescaled to [-1, 1] unless fixed is set.
+    """
+    nodes = list(G.nodes)
+    n = len(nodes)
+    if n == 0:
+        return {}
+    position = {node: i for i, node in enumerate(nodes)}
+    coordinates = np.random.default_rng(seed).random((n, 2))
+    if pos:
+        # spread the unplaced nodes over the bounding box of the placed ones
+        placed = np.array(list(pos.values()), dtype=np.float64).reshape(-1, 2)
+        low, high = placed.min(axis=0), placed.max(axis=0)
+        coordinates = low + coordinates * np.maximum(high - low, 1e-3)
+        for node, xy in pos.items():
+            if node in position:
+                coordinates[position[node]] = xy
+    free = np.ones(n, dtype=bool)
+    if fixed:
+        free[[position[node] for node in fixed if node in position]] = False
+
+    rows = np.fromiter((position[u] for u, _ in G.edges), dtype=np.int64, count=G.number_of_edges())
+    cols = np.fromiter((position[v] for _, v in G.edges), dtype=np.int64, count=G.number_of_edges())
+    a = sp.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n)).tocsr()
+    a = ((a + a.T) > 0).tocoo()
+    rows, cols = a.row, a.col
+
+    k = np.sqrt(1. / n)
+    temperature = 0.1 * max(np.ptp(coordinates[:, 0]), np.ptp(coordinates[:, 1]), 1e-3)
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        displacement = _mesh_repulsion(coordinates, k, free, min(cells, int(np.ceil(np.sqrt(n)))))
+        delta = coordinates[rows] - coordinates[cols]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 0.01)
+        for d in range(2):
+            displacement[:, d] -= np.bincount(rows, weights=delta[:, d] * distance / k, minlength=n)
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 0.01)
+        step = displacement * (np.minimum(length, temperature) / length)[:, None]
+        coordinates[free] += step[free]
+        temperature -= cooling
+
+    if not fixed:
+        coordinates = rescale_layout(coordinates)
+    return dict(zip(nodes, coordinates))
+
+
+class LayoutCache(object):
+    def __init__(self, max_entries: int = 32, max_changed: float = 0.1, incremental_iterations: int = 20):
+        """
+        Caches graph layouts, so that re-plotting a graph (e.g. with a different sized_by) keeps every node in place.
+
+        Layouts are keyed by structure_hash, the method, seed and iterations. On a miss, if the graph differs from the
+        last layout computed by this cache in at most max_changed of its nodes, the layout is updated incrementally:
+        unchanged nodes keep their positions, and only new nodes and the endpoints of added or removed edges are moved.
+
+        :param max_entries: The max number of cached layouts.
+        :param max_changed: The max fraction of changed nodes for an incremental update.
+        :param incremental_iterations: The number of iterations for an incremental update.
+        """
+        self.max_changed = max_changed
+        self.incremental_iterations = incremental_iterations
+        self._layouts = MemoryCache(max_entries=max_entries, ttl=None)
+        self._previous = None
+
+    def layout(self, G: nx.Graph, method: str = 'spring', seed: Optional[int] = 0, iterations: int = 50) -> Dict:
+        """
+        Get the layout of a graph, from the cache if possible.
+
+        :param G: The graph.
+        :param method: One of {'spring', 'sparse'}. 'spring' is networkx.spring_layout, 'sparse' is sparse_layout,
+            which is much faster on graphs with thousands of nodes.
+        :param seed: (optional) The random seed. None gives a new random layout, which is not cached.
+        :param iterations: The number of iterations for a full layout.
+        :return: A dict of {node: array([x, y])}. Treat it as read-only, since it is shared with later calls.
+        """
+        valid_methods = {'spring', 'sparse'}
+        if method not in valid_methods:
+            raise ValueError(f'method argument must be one of {valid_methods}')
+        key = f'{structure_hash(G)}:{method}:{seed}:{iterations}'
+        positions = self._layouts.get(key) if seed is not None else None
+        if positions is not None:
+            return positions
+
+        edges = {frozenset(edge) for edge in G.edges}
+        init, fixed = self._incremental_start(G, edges, method, seed)
+        if fixed is None:
+            positions = self._compute(G, method, None, None, iterations, seed)
+        else:
+            positions = self._compute(G, method, init, fixed, self.incremental_iterations, seed)
+        self._previous = (method, seed, positions, edges)
+        if seed is not None:
+            self._layouts.set(key, positions, 16 * len(positions))
+        return positions
+
+    @staticmethod
+    def _compute(G: nx.Graph, method: str, pos: Optional[Dict], fixed: Optional[list], iterations: int, seed: Optional[int]) -> Dict:
+        if method == 'sparse':
+            return sparse_layout(G, pos=pos, fixed=fixed, iterations=iterations, seed=seed)
+        return spring_layout(G, pos=pos, fixed=fixed, iterations=iterations, seed=seed)
+
+    def _incremental_start(self, G: nx.Graph, edges: set, method: str, seed: Optional[int]):
+        if self._previous is None or self._previous[:2] != (method, seed) or G.number_of_nodes() == 0:
+            return None, None
+        _, _, previous, previous_edges = self._previous
+        changed = {node for node in G.nodes if node not in previous}
+        for edge in edges.symmetric_difference(previous_edges):
+            changed.update(node for node in edge if node in G)
+        if len(changed) > self.max_changed * G.number_of_nodes():
+            return None, None
+        init = {}
+        for node in G.nodes:
+            if node in previous:
+                init[node] = previous[node]
+            else:
+                # start new nodes at the centroid of their placed neighbors, if any
+                neighbors = [previous[v] for v in (nx.all_neighbors(G, node) if G.is_directed() else G.neighbors(node)) if v in previous]
+                if neighbors:
+                    init[node] = np.mean(neighbors, axis=0)
+        fixed = [node for node in init if node not in changed]
+        if not fixed:
+            return None, None
+        return init, fixed
+
+
+LAYOUT_CACHE = LayoutCache()
+
+
+@instrumented('plotting.get_token_flow_traces', size_of='first_arg')
+def _get_token_flow_traces(G: nx.DiGraph, index: Optional[AddressIndex] = None, layout: str = 'spring', seed: Optional[int] = 0):
+    import plotly.graph_objects as go
+
+    positions = LAYOUT_CACHE.layout(G, method=layout, seed=seed)
     edge_x = []
     edge_y = []
     for edge in G.edges():
@@ -132,7 +439,7 @@ def _get_token_flow_traces(G: nx.DiGraph):
     node_text = []
     node_balances = []
     for node in G.nodes():
-        node_text.append(G.nodes[node]['address'])
+        node_text.append(G.nodes[node]['address'] if index is None else index.address(node))
         node_balances.append(np.log10(G.nodes[node]['balance']))
         x, y = positions[node]
         node_x.append(x)
@@ -158,21 +465,61 @@ def _get_token_flow_traces(G: nx.DiGraph):
     return node_trace, edge_trace, node_text, node_balances
 
 
-def plot_payee_graph(G: nx.DiGraph, sized_by: str = 'total_received'):
-    node_trace, edge_trace, node_text, node_balances = _get_token_flow_traces(G)
-    total_received, num_payments = [], []
-    for node, adjacencies in enumerate(G.in_edges(data=True)):
-        total_received_by_node, num_payments_to_node = 0, 0
-        total_received_by_node += adjacencies[2]['total_amount'] / 1e12
-        num_payments_to_node += adjacencies[2]['num_payments']
-        total_received.append(total_received_by_node)
-        num_payments.append(num_payments_to_node)
+@instrumented('plotting.node_flow_stats', size_of='first_arg')
+def node_flow_stats(G: nx.DiGraph) -> Dict[str, np.ndarray]:
+    """
+    Per-node token flow totals of a payments graph, computed in a single pass over the edges and cached on the graph, so
+    sizing plots by different metrics doesn't recompute them. The cache is dropped when the number of nodes or edges
+    changes. After modifying edge attributes in place, delete G.graph['flow_stats'] to recompute.
+
+    :param G: The token flow graph, see create_networkx_graph. Edges should have 'total_amount' and 'num_payments'.
+    :return: A dict of arrays aligned with list(G.nodes): total_received, total_paid and net_flow (received - paid, in
+        the units of total_amount), num_payments_received, num_payments_sent, in_degree and out_degree.
+    """
+    shape = (G.number_of_nodes(), G.number_of_edges())
+    cached = G.graph.get('flow_stats')
+    if cached is not None and cached[0] == shape:
+        return cached[1]
+
+    position = {node: i for i, node in enumerate(G.nodes)}
+    n = len(position)
+    rows, cols, amounts, counts = [], [], [], []
+    for u, v, data in G.edges(data=True):
+        rows.append(position[u])
+        cols.append(position[v])
+        amounts.append(data.get('total_amount') or 0)
+        counts.append(data.get('num_payments') or 0)
+    rows, cols = np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+    amounts, counts = np.array(amounts, dtype=np.float64), np.array(counts, dtype=np.float64)
+
+    stats = {
+        'total_received': np.bincount(cols, weights=amounts, minlength=n),
+        'total_paid': np.bincount(rows, weights=amounts, minlength=n),
+        'num_payments_received': np.bincount(cols, weights=counts, minlength=n),
+        'num_payments_sent': np.bincount(rows, weights=counts, minlength=n),
+        'in_degree': np.bincount(cols, minlength=n),
+        'out_degree': np.bincount(rows, minlength=n),
+    }
+    stats['net_flow'] = stats['total_received'] - stats['total_paid']
+    G.graph['flow_stats'] = (shape, stats)
+    return stats
 
+
+@instrumented('plotting.plot_payee_graph', size_of='first_arg')
+def plot_payee_graph(G: nx.DiGraph, sized_by: str = 'total_received', index: Optional[AddressIndex] = None, layout: str = 'spring',
+                     seed: Optional[int] = 0):
+    import plotly.graph_objects as go
+
+    valid_sized_by = {'total_received', 'num_payments'}
+    if sized_by not in valid_sized_by:
+        raise ValueError(f'sized_by argument must be one of {valid_sized_by}')
+    node_trace, edge_trace, node_text, node_balances = _get_token_flow_traces(G, index, layout, seed)
+    stats = node_flow_stats(G)
     if sized_by == 'total_received':
-        node_trace.marker.size = total_received
+        node_trace.marker.size = stats['total_received'] / 1e12
         title = '<br>Token Flow: Nodes Sized by Total Amount Received over Time Period'
     elif sized_by == 'num_payments':
-        node_trace.marker.size = num_payments
+        node_trace.marker.size = stats['num_payments_received']
         title = '<br>Token Flow: Nodes Sized by Total Number of Payments Received over Time Period'
     node_trace.text = node_text
     node_trace.marker.color = node_balances
@@ -190,23 +537,21 @@ def plot_payee_graph(G: nx.DiGraph, sized_by: str = 'total_received'):
     fig.show()
 
 
-def plot_payer_graph(G: nx.DiGraph, sized_by: str = 'total_paid'):
-    node_trace, edge_trace, node_text, node_balances = _get_token_flow_traces(G)
-    total_received, num_payments = [], []
-    for node, adjacencies in enumerate(G.adjacency()):
-        total_paid_by_node, num_payments_from_node = 0, 0
-        for payee in adjacencies[1]:
-            payment = adjacencies[1][payee]
-            total_paid_by_node += payment['total_amount'] / 1e12
-            num_payments_from_node += payment['num_payments']
-        total_received.append(total_paid_by_node)
-        num_payments.append(num_payments_from_node)
+@instrumented('plotting.plot_payer_graph', size_of='first_arg')
+def plot_payer_graph(G: nx.DiGraph, sized_by: str = 'total_paid', index: Optional[AddressIndex] = None, layout: str = 'spring',
+                     seed: Optional[int] = 0):
+    import plotly.graph_objects as go
 
+    valid_sized_by = {'total_paid', 'num_payments'}
+    if sized_by not in valid_sized_by:
+        raise ValueError(f'sized_by argument must be one of {valid_sized_by}')
+    node_trace, edge_trace, node_text, node_balances = _get_token_flow_traces(G, index, layout, seed)
+    stats = node_flow_stats(G)
     if sized_by == 'total_paid':
-        node_trace.marker.size = total_received
+        node_trace.marker.size = stats['total_paid'] / 1e12
         title = '<br>Token Flow: Nodes Sized by Total Amount Paid over Time Period'
     elif sized_by == 'num_payments':
-        node_trace.marker.size = num_payments
+        node_trace.marker.size = stats['num_payments_sent']
         title = '<br>Token Flow: Nodes Sized by Total Number of Payments Sent over Time Period'
     node_trace.text = node_text
     node_trace.marker.color = node_balances
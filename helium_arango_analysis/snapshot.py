@@ -0,0 +1,196 @@
+import os
+import warnings
+from typing import List, Dict, Optional
+import numpy as np
+import scipy.sparse as sp
+import pyarrow as pa
+import pyarrow.ipc
+from helium_arango_analysis.interning import AddressIndex
+from helium_arango_analysis.sparse import SparseGraph, index_edges, align_records
+
+
+# typed columns for the known node/edge attributes. Only the columns present in a graph are written, and any other
+# attributes are written after them with types inferred by pyarrow.
+NODE_COLUMNS = {
+    'address': pa.string(),
+    'name': pa.string(),
+    'owner': pa.string(),
+    'payer': pa.string(),
+    'location': pa.string(),
+    'location_hex': pa.string(),
+    'mode': pa.dictionary(pa.int32(), pa.string()),
+    'status': pa.dictionary(pa.int32(), pa.string()),
+    'first_timestamp': pa.string(),
+    'first_block': pa.int64(),
+    'last_block': pa.int64(),
+    'last_poc_challenge': pa.int64(),
+    'nonce': pa.int64(),
+    'elevation': pa.float32(),
+    'gain': pa.float32(),
+    'reward_scale': pa.float64(),
+    'lon': pa.float64(),
+    'lat': pa.float64(),
+    'balance': pa.int64(),
+    'dc_balance': pa.int64(),
+    'dc_nonce': pa.int64(),
+    'security_balance': pa.int64(),
+    'staked_balance': pa.int64(),
+}
+EDGE_COLUMNS = {
+    '_from': pa.string(),
+    '_to': pa.string(),
+    'rssi': pa.float32(),
+    'snr': pa.float32(),
+    'distance_m': pa.float64(),
+    'total_amount': pa.float64(),
+    'num_payments': pa.int64(),
+    'time': pa.timestamp('s'),
+    'timestamp': pa.timestamp('ns'),
+}
+
+
+def _node_value(node: Optional[dict], key: str):
+    if node is None:
+        return None
+    if key in ('lon', 'lat'):
+        coordinates = (node.get('geo_location') or {}).get('coordinates')
+        return None if coordinates is None else coordinates[0 if key == 'lon' else 1]
+    return node.get(key)
+
+
+def _build_table(records: List[Optional[dict]], columns: Dict[str, pa.DataType], get_value,
+                 skip: tuple = ()) -> Dict[str, pa.Array]:
+    arrays = {}
+    for key, type in columns.items():
+        values = [get_value(r, key) for r in records]
+        if all(v is None for v in values):
+            continue
+        if pa.types.is_dictionary(type):
+            arrays[key] = pa.array(values, type=type.value_type).dictionary_encode()
+        else:
+            arrays[key] = pa.array(values, type=type)
+
+    extra = dict.fromkeys(key for r in records if r is not None for key in r if key not in columns and key not in skip)
+    for key in extra:
+        values = [None if r is None else r.get(key) for r in records]
+        if all(v is None for v in values):
+            continue
+        try:
+            arrays[key] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            warnings.warn(f'Not saving the {key} attribute, its values have no common Arrow type: {e}')
+    return arrays
+
+
+def save_snapshot(graph: dict, path: str, format: str = 'arrow'):
+    """
+    Write the nodes/edges of a graph response to a directory of typed, columnar files: nodes.<format> and edges.<format>.
+
+    Nodes are stored in the same order as make_sparse_graph assigns ids, and edges are deduplicated, sorted row-major and
+    carry int32 from_id/to_id columns pointing into the nodes file, so the adjacency can be rebuilt without any lookups.
+    Known attributes get the types in NODE_COLUMNS and EDGE_COLUMNS, and other attributes, e.g. the receipt fields of
+    witness edges, are kept with types inferred by pyarrow. An attribute with values of mixed types is skipped with a
+    warning.
+
+    :param graph: A {'nodes': [...], 'edges': [...]} graph response, e.g. from get_witness_graph_in_hex or get_top_payees_graph.
+    :param path: The output directory. Created if needed.
+    :param format: One of {'arrow', 'parquet'}. Arrow IPC files are uncompressed and can be memory-mapped on reload.
+        Parquet files are smaller, but are decoded into memory when read.
+    """
+    valid_formats = {'arrow', 'parquet'}
+    if format not in valid_formats:
+        raise ValueError(f'format argument must be one of {valid_formats}')
+    nodes, edges = graph['nodes'], graph['edges']
+    index, rows, cols, order = index_edges(nodes, edges)
+    node_arrays = _build_table(align_records(nodes, index), NODE_COLUMNS, _node_value, skip=('geo_location',))
+    node_arrays['address'] = pa.array(index.addresses(), type=pa.string())
+    edge_arrays = {
+        'from_id': pa.array(rows.astype(np.int32)),
+        'to_id': pa.array(cols.astype(np.int32)),
+        **_build_table([edges[k] for k in order], EDGE_COLUMNS, lambda edge, key: edge.get(key), skip=('from_id', 'to_id'))
+    }
+
+    os.makedirs(path, exist_ok=True)
+    for name, arrays in (('nodes', node_arrays), ('edges', edge_arrays)):
+        table = pa.table(arrays)
+        filename = os.path.join(path, f'{name}.{format}')
+        if format == 'arrow':
+            with pa.OSFile(filename, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            import pyarrow.parquet as pq
+            pq.write_table(table, filename)
+
+
+def load_snapshot(path: str, memory_map: bool = True) -> Dict[str, pa.Table]:
+    """
+    Load a snapshot written by save_snapshot. Arrow snapshots are memory-mapped, so opening them is near-instant
+    regardless of size and columns are only paged in when accessed.
+
+    :param path: The snapshot directory.
+    :param memory_map: If True, memory-map Arrow files instead of reading them into memory.
+    :return: A dict of {'nodes': pyarrow.Table, 'edges': pyarrow.Table}.
+    """
+    tables = {}
+    for name in ('nodes', 'edges'):
+        filename = os.path.join(path, f'{name}.arrow')
+        if os.path.exists(filename):
+            source = pa.memory_map(filename, 'r') if memory_map else pa.OSFile(filename, 'rb')
+            tables[name] = pa.ipc.open_file(source).read_all()
+        else:
+            import pyarrow.parquet as pq
+            tables[name] = pq.read_table(os.path.join(path, f'{name}.parquet'), memory_map=memory_map)
+    return tables
+
+
+def column_to_numpy(table: pa.Table, column: str, fill_value: float = np.nan) -> np.ndarray:
+    """
+    Get a numeric column as a NumPy array. Columns without nulls are returned zero-copy, as views of the (memory-mapped) buffers.
+
+    :param table: A table returned by load_snapshot.
+    :param column: The column name.
+    :param fill_value: The value to use for nulls, if any. Forces a copy.
+    :return: The NumPy array.
+    """
+    array = table.column(column)
+    if array.null_count == 0:
+        if array.num_chunks == 1:
+            return array.chunk(0).to_numpy(zero_copy_only=False)
+        return array.to_numpy()
+    return array.cast(pa.float64()).fill_null(fill_value).to_numpy()
+
+
+def snapshot_to_sparse(snapshot: Dict[str, pa.Table], node_features: Optional[List[str]] = None,
+                       edge_features: Optional[List[str]] = None, fill_value: float = np.nan, dtype=np.float32) -> SparseGraph:
+    """
+    Build a SparseGraph from a loaded snapshot, matching make_sparse_graph on the original graph response.
+
+    :param snapshot: The tables returned by load_snapshot.
+    :param node_features: (optional) A list of numeric node columns, e.g. ['elevation', 'gain']
+    :param edge_features: (optional) A list of numeric edge columns, e.g. ['rssi', 'snr']
+    :param fill_value: The value to use for missing features.
+    :param dtype: The dtype of the adjacency and feature matrices.
+    :return: The SparseGraph.
+    """
+    nodes, edges = snapshot['nodes'], snapshot['edges']
+    addresses = nodes.column('address').to_pylist()
+    rows, cols = column_to_numpy(edges, 'from_id'), column_to_numpy(edges, 'to_id')
+    a = sp.csr_matrix((np.ones(len(rows), dtype=dtype), (rows, cols)), shape=(len(addresses), len(addresses)))
+
+    def features(table, keys):
+        if keys is None:
+            return None, None
+        values = np.full((table.num_rows, len(keys)), fill_value, dtype=dtype)
+        mask = np.zeros((table.num_rows, len(keys)), dtype=bool)
+        for j, key in enumerate(keys):
+            if key in table.column_names:
+                column = table.column(key)
+                values[:, j] = column_to_numpy(table, key, fill_value)
+                mask[:, j] = column.is_valid().to_numpy(zero_copy_only=False)
+        return values, mask
+
+    x, x_mask = features(nodes, node_features)
+    e, e_mask = features(edges, edge_features)
+    return SparseGraph(addresses, AddressIndex(addresses), a,
+                       np.vstack([rows, cols]).astype(np.int64), x, e, list(node_features or []), list(edge_features or []),
+                       x_mask, e_mask)
@@ -0,0 +1,132 @@
+from typing import List, Dict, Optional, NamedTuple, Tuple
+import numpy as np
+import scipy.sparse as sp
+from helium_arango_analysis.interning import AddressIndex
+from helium_arango_analysis.instrumentation import instrumented
+
+
+class SparseGraph(NamedTuple):
+    """
+    A graph stored as a sparse adjacency matrix plus dense feature matrices, with nodes mapped to contiguous integer ids.
+
+    addresses[i] is the address of node i and index[address] == i. Edges are sorted row-major, i.e. in the order of the
+    nonzero entries of a, so row k of e holds the features of the edge (edge_index[0, k], edge_index[1, k]). x_mask and
+    e_mask are True where a feature was present, rather than filled in.
+    """
+    addresses: List[str]
+    index: AddressIndex
+    a: sp.csr_matrix
+    edge_index: np.ndarray
+    x: Optional[np.ndarray]
+    e: Optional[np.ndarray]
+    node_features: List[str]
+    edge_features: List[str]
+    x_mask: Optional[np.ndarray] = None
+    e_mask: Optional[np.ndarray] = None
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.addresses)
+
+    @property
+    def n_edges(self) -> int:
+        return self.edge_index.shape[1]
+
+
+@instrumented('sparse.extract_features')
+def extract_features(records: List[Optional[dict]], keys: List[str], fill_value: float = np.nan, dtype=np.float32,
+                     categories: Optional[Dict[str, list]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extract numeric features column by column into a dense matrix. Bools and NumPy scalars are cast to dtype.
+
+    :param records: The list of node or edge dicts. None entries are treated as records with every feature missing.
+    :param keys: The feature keys, one per column.
+    :param fill_value: The value to use for missing or None features.
+    :param dtype: The dtype of the feature matrix.
+    :param categories: (optional) A dict mapping categorical keys, e.g. 'mode' or 'status', to their list of known values.
+        Values are encoded as their position in the list, and unseen values are appended to it in place, so passing the
+        same dict across calls keeps the encoding consistent.
+    :return: A tuple of (values, mask) (len(records), len(keys)) arrays, where mask is True for features that were present.
+    """
+    values = np.empty((len(records), len(keys)), dtype=dtype)
+    mask = np.empty((len(records), len(keys)), dtype=bool)
+    for j, key in enumerate(keys):
+        column = [None if r is None else r.get(key) for r in records]
+        if categories is not None and key in categories:
+            codes = {value: i for i, value in enumerate(categories[key])}
+            column = [None if v is None else codes.setdefault(v, len(codes)) for v in column]
+            categories[key][:] = list(codes)
+        mask[:, j] = np.fromiter((v is not None for v in column), dtype=bool, count=len(column))
+        try:
+            values[:, j] = np.array([fill_value if v is None else v for v in column], dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Feature {key} has non-numeric values. Pass it in categories to encode it.') from e
+    return values, mask
+
+
+def index_edges(nodes: List[dict], edges: List[dict], index: Optional[AddressIndex] = None) -> Tuple[AddressIndex, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Map node addresses to contiguous integer ids and sort the edges row-major.
+
+    New nodes get ids in the order of the nodes list, followed by any addresses that only appear in edges. Duplicate
+    (_from, _to) edges are collapsed, keeping the last one, as in create_networkx_graph.
+
+    :param nodes: The list of nodes returned from a HeliumArangoHTTPClient graph request.
+    :param edges: The list of edges returned from a HeliumArangoHTTPClient graph request.
+    :param index: (optional) An existing AddressIndex to extend, e.g. to share ids across several graphs.
+    :return: A tuple of (index, rows, cols, order), where edges[order[k]] is the edge from node rows[k] to node cols[k].
+    """
+    index = AddressIndex() if index is None else index
+    for node in nodes:
+        index.add(node['address'])
+    rows = index.ids((edge['_from'] for edge in edges)).astype(np.int64)
+    cols = index.ids((edge['_to'] for edge in edges)).astype(np.int64)
+
+    # np.unique on the reversed keys finds the last occurrence of each edge and returns them sorted row-major
+    _, last = np.unique((rows * len(index) + cols)[::-1], return_index=True)
+    order = len(edges) - 1 - last
+    return index, rows[order], cols[order], order
+
+
+def align_records(nodes: List[dict], index: AddressIndex) -> List[Optional[dict]]:
+    """
+    :param nodes: The list of nodes.
+    :param index: An AddressIndex containing every node address.
+    :return: A list of len(index) node dicts in id order, with None for ids that have no node in nodes.
+    """
+    records = [None] * len(index)
+    for node in nodes:
+        records[index[node['address']]] = node
+    return records
+
+
+@instrumented('sparse.make_sparse_graph')
+def make_sparse_graph(nodes: List[dict], edges: List[dict], node_features: Optional[List[str]] = None,
+                      edge_features: Optional[List[str]] = None, fill_value: float = np.nan, dtype=np.float32,
+                      index: Optional[AddressIndex] = None) -> SparseGraph:
+    """
+    Build a SparseGraph directly from the nodes and edges of a HeliumArangoHTTPClient graph request, without going
+    through networkx. Nodes and edges are ordered as in index_edges.
+
+    :param nodes: The list of nodes returned from a HeliumArangoHTTPClient graph request.
+    :param edges: The list of edges returned from a HeliumArangoHTTPClient graph request.
+    :param node_features: (optional) A list of node feature keys, e.g. ['elevation', 'gain']
+    :param edge_features: (optional) A list of edge feature keys, e.g. ['rssi', 'snr']
+    :param fill_value: The value to use for missing or None features.
+    :param dtype: The dtype of the adjacency and feature matrices.
+    :param index: (optional) An existing AddressIndex to extend, e.g. to share ids across several graphs. Note that the
+        graph then spans every address in the index, including those of previous graphs.
+    :return: The SparseGraph.
+    """
+    index, rows, cols, order = index_edges(nodes, edges, index)
+    n = len(index)
+    a = sp.csr_matrix((np.ones(len(order), dtype=dtype), (rows, cols)), shape=(n, n))
+
+    x, e, x_mask, e_mask = None, None, None, None
+    if node_features is not None:
+        x, x_mask = extract_features(align_records(nodes, index), node_features, fill_value, dtype)
+    if edge_features is not None:
+        e, e_mask = extract_features([edges[k] for k in order], edge_features, fill_value, dtype)
+
+    return SparseGraph(index.addresses(), index, a, np.vstack([rows, cols]), x, e, list(node_features or []),
+                       list(edge_features or []), x_mask, e_mask)
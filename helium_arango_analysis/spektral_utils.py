@@ -1,10 +1,15 @@
-from helium_arango_analysis.adapters import create_networkx_graph
-from spektral.data import Graph
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import List, Optional
+from helium_arango_analysis.sparse import SparseGraph, make_sparse_graph
+from helium_arango_analysis.instrumentation import instrumented
 import numpy as np
-import networkx as nx
 
 
-def make_spektral_graph(nodes: list, edges: list, node_features: list, edge_features: list, output=None) -> Graph:
+@instrumented('spektral_utils.make_spektral_graph')
+def make_spektral_graph(nodes: list, edges: list, node_features: list, edge_features: list, output=None,
+                        fill_value: float = 0., mask: bool = False, dtype=np.float64) -> 'spektral.data.Graph':
     """
     Creates a spektral graph object for assembling training datasets.
 
@@ -13,35 +18,94 @@ def make_spektral_graph(nodes: list, edges: list, node_features: list, edge_feat
     :param node_features: A list of node feature keys, e.g. ['elevation', 'gain']
     :param edge_features: A list of edge feature keys, e.g. ['rssi', 'snr']
     :param output: An optional string key to define the target of the node-based regression task, e.g. 'reward_scale'
+    :param fill_value: The value to use for missing or None features and outputs.
+    :param mask: If True, attach boolean x_mask, e_mask and y_mask arrays to the graph, True where the value was present.
+    :param dtype: The dtype of the adjacency and feature matrices.
     :return: The spektral.data.graph.Graph object
     """
-    n_nodes, n_edges, n_node_features, n_edge_features = len(nodes), len(edges), len(node_features), len(edge_features)
-
-    g = create_networkx_graph(nodes, edges)
-    a = nx.convert_matrix.to_scipy_sparse_matrix(g)
-    x = np.empty((n_nodes, n_node_features))
-
-    if output:
-        y = np.empty((n_nodes,1))
-    else:
-        y = None
-    nodelist, edgelist = list(g.nodes), list(g.edges)
-    for i in range(len(nodelist)):
-        node_data = g.nodes(data=True)[nodelist[i]]
-        try:
-            y[i] = node_data[output]
-        except TypeError:
-            pass
-        for j in range(n_node_features):
-            x[i,j] = node_data[node_features[j]]
-    if edge_features:
-        e = np.empty((n_edges, n_edge_features))
-        for i in range(n_edges):
-            edge_data = g.edges[edgelist[i][0], edgelist[i][1]]
-            for j in range(n_edge_features):
-                e[i,j] = edge_data[edge_features[j]]
-    else:
-        e = None
-
-    y = np.nan_to_num(y, nan=0)
-    return Graph(x, a, e, y)
\ No newline at end of file
+    from spektral.data import Graph
+
+    keys = list(node_features) + ([output] if output else [])
+    sg = make_sparse_graph(nodes, edges, keys, edge_features or None, fill_value, dtype)
+    n_node_features = len(node_features)
+
+    x, x_mask = sg.x[:, :n_node_features], sg.x_mask[:, :n_node_features]
+    y, y_mask = (sg.x[:, n_node_features:], sg.x_mask[:, n_node_features:]) if output else (None, None)
+    if mask:
+        return Graph(x, sg.a, sg.e, y, x_mask=x_mask, e_mask=sg.e_mask, y_mask=y_mask)
+    return Graph(x, sg.a, sg.e, y)
+
+
+@instrumented('spektral_utils.make_spektral_graphs')
+def make_spektral_graphs(graphs: List[dict], node_features: list, edge_features: list, output=None,
+                         fill_value: float = 0., mask: bool = False, dtype=np.float64, max_workers: Optional[int] = None) -> List['spektral.data.Graph']:
+    """
+    Creates spektral graph objects from many graph responses in parallel, using a process pool.
+
+    :param graphs: A list of {'nodes': [...], 'edges': [...]} graph responses, e.g. from get_witness_graph_in_hex.
+    :param max_workers: (optional) The number of processes. Defaults to the number of CPUs.
+    :return: The list of spektral.data.graph.Graph objects, in the same order as graphs.
+
+    See make_spektral_graph for the remaining parameters.
+    """
+    build = partial(_make_spektral_graph, node_features=node_features, edge_features=edge_features, output=output,
+                    fill_value=fill_value, mask=mask, dtype=dtype)
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(build, graphs, chunksize=max(1, len(graphs) // (4 * max_workers))))
+
+
+def _make_spektral_graph(graph: dict, **kwargs) -> 'spektral.data.Graph':
+    return make_spektral_graph(graph['nodes'], graph['edges'], **kwargs)
+
+
+@lru_cache(maxsize=None)
+def _dataset_class() -> type:
+    # spektral (and with it TensorFlow) is only imported once the dataset class is first needed
+    from spektral.data import Dataset
+
+    class HeliumGraphDataset(Dataset):
+        def __init__(self, graphs: list, **kwargs):
+            """
+            An in-memory spektral Dataset of prebuilt graphs, e.g. from make_spektral_graphs.
+
+            :param graphs: The list of spektral.data.graph.Graph objects.
+            """
+            self._graphs = graphs
+            super().__init__(**kwargs)
+
+        def read(self) -> list:
+            return self._graphs
+
+    HeliumGraphDataset.__module__, HeliumGraphDataset.__qualname__ = __name__, 'HeliumGraphDataset'
+    return HeliumGraphDataset
+
+
+def __getattr__(name: str):
+    if name == 'HeliumGraphDataset':
+        return _dataset_class()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def make_spektral_dataset(graphs: List[dict], node_features: list, edge_features: list, output=None,
+                          fill_value: float = 0., mask: bool = False, dtype=np.float64, max_workers: Optional[int] = None) -> 'HeliumGraphDataset':
+    """
+    Creates a spektral Dataset from many graph responses in parallel, see make_spektral_graphs.
+
+    :return: The HeliumGraphDataset (a spektral.data.dataset.Dataset).
+    """
+    return _dataset_class()(make_spektral_graphs(graphs, node_features, edge_features, output, fill_value, mask, dtype, max_workers))
+
+
+@instrumented('spektral_utils.sparse_to_spektral_graph')
+def sparse_to_spektral_graph(sg: SparseGraph, y: np.ndarray = None) -> 'spektral.data.Graph':
+    """
+    Creates a spektral graph object directly from a SparseGraph, see helium_arango_analysis.sparse.make_sparse_graph.
+
+    :param sg: The SparseGraph.
+    :param y: (optional) The node- or graph-level targets.
+    :return: The spektral.data.graph.Graph object
+    """
+    from spektral.data import Graph
+
+    return Graph(sg.x, sg.a, sg.e, y)
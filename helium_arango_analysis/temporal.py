@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, NamedTuple, Tuple, Iterable
+import numpy as np
+import scipy.sparse as sp
+from helium_arango_analysis.client import HeliumArangoHTTPClient
+from helium_arango_analysis.interning import AddressIndex
+from helium_arango_analysis.sparse import SparseGraph, extract_features, align_records
+
+
+class SnapshotDiff(NamedTuple):
+    """
+    The change from one snapshot of a TokenFlowSeries to the next. added and removed are (2, k) arrays of the
+    (_from, _to) ids of edges that appear or disappear, sorted row-major. delta holds one sparse (n, n) matrix per edge
+    feature, the current minus the previous values, with entries only where the value changed.
+    """
+    added: np.ndarray
+    removed: np.ndarray
+    delta: List[sp.csr_matrix]
+
+
+class TokenFlowSeries(NamedTuple):
+    """
+    A token flow graph as a sequence of time buckets over one shared set of node ids.
+
+    times[t] is the (min_time, max_time) of bucket t. snapshots[t] is a SparseGraph of the payments in bucket t, with
+    every snapshot spanning all addresses of the series, so they can be stacked or subtracted directly. diffs[t] is the
+    change from snapshots[t - 1] to snapshots[t], where diffs[0] is relative to an empty graph. nodes[i] is the most
+    recent account dict seen for node i.
+    """
+    addresses: List[str]
+    index: AddressIndex
+    times: np.ndarray
+    snapshots: List[SparseGraph]
+    diffs: List[SnapshotDiff]
+    nodes: List[Optional[dict]]
+
+    @property
+    def n_buckets(self) -> int:
+        return len(self.snapshots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.addresses)
+
+
+def bucket_intervals(min_time: int, max_time: int, bucket: int) -> List[Tuple[int, int]]:
+    """
+    :param min_time: The first UTC timestamp.
+    :param max_time: The last UTC timestamp.
+    :param bucket: The bucket length in seconds, e.g. 3600 for hourly or 86400 for daily buckets.
+    :return: The inclusive (min_time, max_time) intervals covering [min_time, max_time], the last one possibly shorter.
+    """
+    return [(t, min(t + bucket - 1, max_time)) for t in range(min_time, max_time + 1, bucket)]
+
+
+def fetch_token_flow_buckets(client: HeliumArangoHTTPClient, min_time: int, max_time: int, bucket: int = 86400,
+                             side: str = 'payees', limit: Optional[int] = 100,
+                             max_workers: Optional[int] = None) -> List[Tuple[int, int, dict]]:
+    """
+    Fetch one token flow graph per time bucket, in parallel.
+
+    :param client: The HeliumArangoHTTPClient to fetch payments with.
+    :param min_time: The first UTC timestamp.
+    :param max_time: The last UTC timestamp.
+    :param bucket: The bucket length in seconds.
+    :param side: One of {'payees', 'payers'}, i.e. whether to query get_top_payees_graph or get_top_payers_graph.
+    :param limit: The max number of top payees/payers to seed each bucket's graph.
+    :param max_workers: (optional) The number of threads. Defaults to the client's connection pool size.
+    :return: A list of (min_time, max_time, graph) tuples in time order.
+    """
+    methods = {'payees': client.get_top_payees_graph, 'payers': client.get_top_payers_graph}
+    if side not in methods:
+        raise ValueError(f'side argument must be one of {set(methods)}')
+    method = methods[side]
+    intervals = bucket_intervals(min_time, max_time, bucket)
+
+    def fetch(interval):
+        return interval[0], interval[1], method(limit=limit, min_time=interval[0], max_time=interval[1])
+
+    with ThreadPoolExecutor(max_workers=min(len(intervals), max_workers or client.pool_size) or 1) as executor:
+        return list(executor.map(fetch, intervals))
+
+
+def diff_snapshots(previous: Optional[SparseGraph], current: SparseGraph) -> SnapshotDiff:
+    """
+    :param previous: The earlier snapshot, or None for an empty graph.
+    :param current: The later snapshot, with the same nodes and edge features as previous.
+    :return: The SnapshotDiff from previous to current.
+    """
+    n = current.n_nodes
+    keys = current.edge_index[0] * n + current.edge_index[1]
+    if previous is None:
+        previous_keys = np.empty(0, dtype=keys.dtype)
+        previous_e = sp.csr_matrix((n, n), dtype=current.e.dtype)
+    else:
+        previous_keys = previous.edge_index[0] * n + previous.edge_index[1]
+    added = np.setdiff1d(keys, previous_keys, assume_unique=True)
+    removed = np.setdiff1d(previous_keys, keys, assume_unique=True)
+
+    delta = []
+    for j in range(len(current.edge_features)):
+        e = sp.csr_matrix((current.e[:, j], tuple(current.edge_index)), shape=(n, n))
+        if previous is not None:
+            previous_e = sp.csr_matrix((previous.e[:, j], tuple(previous.edge_index)), shape=(n, n))
+        d = (e - previous_e).tocsr()
+        d.eliminate_zeros()
+        delta.append(d)
+    return SnapshotDiff(np.vstack([added // n, added % n]), np.vstack([removed // n, removed % n]), delta)
+
+
+def make_token_flow_series(buckets: Iterable[Tuple[int, int, dict]],
+                           edge_features: Iterable[str] = ('total_amount', 'num_payments'), dtype=np.float64,
+                           index: Optional[AddressIndex] = None) -> TokenFlowSeries:
+    """
+    Build a TokenFlowSeries from per-bucket token flow graphs, e.g. from fetch_token_flow_buckets. Ids are assigned
+    across all buckets first, so every snapshot has the same shape. Duplicate (_from, _to) edges within a bucket are
+    summed, and missing feature values count as 0.
+
+    :param buckets: (min_time, max_time, graph) tuples in time order, with {'nodes': [...], 'edges': [...]} graphs.
+    :param edge_features: The numeric edge keys to aggregate, one edge feature column each.
+    :param dtype: The dtype of the adjacency and edge feature matrices.
+    :param index: (optional) An existing AddressIndex to extend, e.g. to share ids with other graphs.
+    :return: The TokenFlowSeries.
+    """
+    buckets = list(buckets)
+    edge_features = list(edge_features)
+    index = AddressIndex() if index is None else index
+    latest = {}
+    for _, _, graph in buckets:
+        for node in graph['nodes']:
+            index.add(node['address'])
+            latest[node['address']] = node
+    endpoints = [(index.ids(edge['_from'] for edge in graph['edges']).astype(np.int64),
+                  index.ids(edge['_to'] for edge in graph['edges']).astype(np.int64)) for _, _, graph in buckets]
+    n = len(index)
+    addresses = index.addresses()
+
+    snapshots, diffs = [], []
+    for (_, _, graph), (rows, cols) in zip(buckets, endpoints):
+        keys, inverse = np.unique(rows * n + cols, return_inverse=True)
+        values, _ = extract_features(graph['edges'], edge_features, 0., np.float64)
+        e = np.empty((len(keys), len(edge_features)), dtype=dtype)
+        for j in range(len(edge_features)):
+            e[:, j] = np.bincount(inverse.ravel(), weights=values[:, j], minlength=len(keys))
+        edge_index = np.vstack([keys // n, keys % n])
+        a = sp.csr_matrix((np.ones(len(keys), dtype=dtype), tuple(edge_index)), shape=(n, n))
+        snapshot = SparseGraph(addresses, index, a, edge_index, None, e, [], list(edge_features))
+        diffs.append(diff_snapshots(snapshots[-1] if snapshots else None, snapshot))
+        snapshots.append(snapshot)
+
+    times = np.array([(min_time, max_time) for min_time, max_time, _ in buckets], dtype=np.int64).reshape(-1, 2)
+    return TokenFlowSeries(addresses, index, times, snapshots, diffs, align_records(list(latest.values()), index))
+
+
+def get_token_flow_series(client: HeliumArangoHTTPClient, min_time: int, max_time: int, bucket: int = 86400,
+                          side: str = 'payees', limit: Optional[int] = 100,
+                          edge_features: Iterable[str] = ('total_amount', 'num_payments'), dtype=np.float64,
+                          max_workers: Optional[int] = None) -> TokenFlowSeries:
+    """
+    Fetch the token flow graph in time buckets over [min_time, max_time] concurrently and build a TokenFlowSeries, see
+    fetch_token_flow_buckets and make_token_flow_series.
+
+    :return: The TokenFlowSeries.
+    """
+    buckets = fetch_token_flow_buckets(client, min_time, max_time, bucket, side, limit, max_workers)
+    return make_token_flow_series(buckets, edge_features, dtype)
@@ -0,0 +1,117 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
+from helium_arango_analysis.client import HeliumArangoHTTPClient
+
+
+class TokenFlowWindow(object):
+    def __init__(self, client: HeliumArangoHTTPClient, side: str = 'payees', window: int = 7 * 24 * 3600,
+                 limit: Optional[int] = 100, resolution: int = 3600):
+        """
+        A sliding-window token flow graph that is kept up to date incrementally. Each call to sync() fetches only the
+        payments since the previous sync and folds them into a locally held edge table, aggregated per (_from, _to),
+        then ages out the payments that have fallen out of the window.
+
+        Note that each increment is seeded by its own top payees/payers, so the result approximates, rather than
+        reproduces, get_top_payees_graph/get_top_payers_graph over the full window.
+
+        :param client: The HeliumArangoHTTPClient to fetch payments with.
+        :param side: One of {'payees', 'payers'}, i.e. whether to follow get_top_payees_graph or get_top_payers_graph.
+        :param window: The length of the sliding window in seconds.
+        :param limit: The max number of top payees/payers to seed each increment.
+        :param resolution: The initial window is backfilled in chunks of this many seconds, fetched in parallel. Payments
+            age out one increment at a time, so the window may overhang by up to one chunk or one sync interval.
+        """
+        methods = {'payees': client.get_top_payees_graph, 'payers': client.get_top_payers_graph}
+        if side not in methods:
+            raise ValueError(f'side argument must be one of {set(methods)}')
+        self.client = client
+        self.side = side
+        self.window = window
+        self.limit = limit
+        self.resolution = resolution
+        self.max_time = None
+        self._fetch = methods[side]
+        self._increments = deque()
+        self._edges = {}
+        self._nodes = {}
+
+    def _fetch_increment(self, interval: Tuple[int, int]) -> Tuple[int, int, dict, List[dict]]:
+        min_time, max_time = interval
+        nodes, edges = self._fetch(limit=self.limit, min_time=min_time, max_time=max_time).values()
+        aggregated = {}
+        for edge in edges:
+            totals = aggregated.setdefault((edge['_from'], edge['_to']), [0, 0])
+            totals[0] += edge['total_amount']
+            totals[1] += edge['num_payments']
+        return min_time, max_time, aggregated, nodes
+
+    def _fold(self, aggregated: dict, sign: int):
+        for key, (total_amount, num_payments) in aggregated.items():
+            totals = self._edges.setdefault(key, [0, 0])
+            totals[0] += sign * total_amount
+            totals[1] += sign * num_payments
+            if totals[1] <= 0:
+                del self._edges[key]
+
+    def sync(self, now: Optional[int] = None) -> int:
+        """
+        Fetch the payments in (last sync, now], fold them into the edge table and age out the expired tail of the window.
+        The first call backfills the whole window.
+
+        :param now: (optional) The UTC timestamp to sync up to. Defaults to now.
+        :return: The number of increments fetched.
+        """
+        now = int(datetime.utcnow().timestamp()) if now is None else now
+        if self.max_time is None:
+            start = now - self.window
+            intervals = [(t, min(t + self.resolution - 1, now)) for t in range(start, now + 1, self.resolution)]
+        elif now > self.max_time:
+            intervals = [(self.max_time + 1, now)]
+        else:
+            intervals = []
+        with ThreadPoolExecutor(max_workers=min(len(intervals), self.client.pool_size) or 1) as executor:
+            increments = list(executor.map(self._fetch_increment, intervals))
+        for min_time, max_time, aggregated, nodes in increments:
+            self._increments.append((min_time, max_time, aggregated))
+            self._fold(aggregated, 1)
+            for node in nodes:
+                self._nodes[node['address']] = node
+        if intervals:
+            self.max_time = now
+
+        while self._increments and self._increments[0][1] <= now - self.window:
+            self._fold(self._increments.popleft()[2], -1)
+        addresses = {address for key in self._edges for address in key}
+        self._nodes = {address: node for address, node in self._nodes.items() if address in addresses}
+        return len(increments)
+
+    @property
+    def edges(self) -> List[dict]:
+        """
+        The aggregated edges in the current window, with total_amount and num_payments per (_from, _to).
+        """
+        return [{'_from': key[0], '_to': key[1], 'total_amount': total_amount, 'num_payments': num_payments}
+                for key, (total_amount, num_payments) in self._edges.items()]
+
+    @property
+    def nodes(self) -> List[dict]:
+        """
+        The accounts with at least one edge in the current window.
+        """
+        return list(self._nodes.values())
+
+    def to_graph(self) -> Dict[str, List[dict]]:
+        """
+        :return: The current window as a {'nodes': [...], 'edges': [...]} graph, like get_top_payees_graph.
+        """
+        return {'nodes': self.nodes, 'edges': self.edges}
+
+    def to_networkx(self, name: str = None):
+        """
+        :param name: (optional) The name of graph.
+        :return: The current window as a networkx directed graph, see create_networkx_graph.
+        """
+        from helium_arango_analysis.adapters import create_networkx_graph
+        return create_networkx_graph(self.nodes, self.edges, name=name)
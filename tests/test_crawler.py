@@ -0,0 +1,44 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_server import SyntheticHeliumData, FakeHeliumArangoServer
+from helium_arango_analysis.client import HeliumArangoHTTPClient
+from helium_arango_analysis.crawler import WitnessCrawler
+
+
+@pytest.fixture(scope='module')
+def client():
+    data = SyntheticHeliumData(n_hotspots=2000, n_witness_edges=12000, n_accounts=10, n_payment_edges=10, seed=0)
+    with FakeHeliumArangoServer(data, latency=0.) as server, HeliumArangoHTTPClient(server.base_url) as client:
+        client.seeds = [data.hotspots[0]['address'], data.hotspots[1]['address']]
+        yield client
+
+
+def _as_sets(graph: dict):
+    return {node['address'] for node in graph['nodes']}, {(edge['_from'], edge['_to']) for edge in graph['edges']}
+
+
+@pytest.mark.parametrize('direction', ['outbound', 'both'])
+def test_resumed_crawl_matches_uninterrupted_crawl(client, tmp_path, direction):
+    kwargs = dict(direction=direction, max_depth=4, max_nodes=120, batch_size=25)
+    expected = WitnessCrawler(client, client.seeds, **kwargs).crawl()
+
+    path = str(tmp_path / 'crawl.jsonl')
+    interrupted = WitnessCrawler(client, client.seeds, checkpoint_path=path, **kwargs)
+    for _ in range(3):
+        interrupted.step()
+    resumed = WitnessCrawler(client, [], checkpoint_path=path, **kwargs)
+    assert 0 < resumed.expanded == interrupted.expanded < 120
+    assert resumed.index.addresses() == interrupted.index.addresses()
+
+    assert _as_sets(resumed.crawl()) == _as_sets(expected)
+    assert resumed.expanded == 120
+
+
+def test_max_nodes_crawl_is_deterministic(client):
+    crawls = [WitnessCrawler(client, client.seeds, max_depth=4, max_nodes=60, batch_size=20) for _ in range(3)]
+    graphs = [crawl.crawl() for crawl in crawls]
+    assert all(crawl.index.addresses() == crawls[0].index.addresses() for crawl in crawls)
+    assert all(_as_sets(graph) == _as_sets(graphs[0]) for graph in graphs)